@@ -0,0 +1,177 @@
+"""Time spent in each stage of a refresh, for growing job lists.
+
+Synthetic clusters are recorded to disk first, then every stage is timed on
+the replayed outputs so that no Slurm controller is involved. Each timing is
+the best of ``--repeat`` runs, in milliseconds::
+
+    python benchmarks/bench_refresh.py --jobs 1000,10000,100000
+
+A directory saved with ``slurmtop --record`` can be timed instead with
+``--replay DIR``.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from textual.app import App, ComposeResult
+
+from slurmtop._data import SinfoData, SlurmData, SqueueData
+from slurmtop._jobfilter import JobFilter
+from slurmtop._jobview import JobTableView
+from slurmtop._metrics import JobMetrics
+from slurmtop._render import FrameScheduler
+from slurmtop._replay import RecordingRunner, ReplayRunner, SyntheticRunner
+from slurmtop._squeue_widget import SqueueViewer
+
+FORMAT_ARGS = ("squeue", "-h", "-o", SqueueData.squeue_format)
+
+
+class ViewerApp(App):
+    """The job list alone, not polling, so that only the timed code runs."""
+
+    def __init__(self, slurm: SlurmData):
+        super().__init__()
+        self.slurm = slurm
+        self.frames = FrameScheduler(self)
+
+    def compose(self) -> ComposeResult:
+        yield SqueueViewer(self.slurm)
+
+
+async def record_synthetic(directory: str, partitions: int, jobs: int) -> None:
+    """Record two refreshes of a synthetic cluster, 1% of the jobs apart."""
+    synthetic = SyntheticRunner(partitions=partitions, jobs=jobs, churn=0.01)
+    recorder = RecordingRunner(directory)
+    commands = [
+        (("sinfo", "-V"), None),
+        (("sinfo", "-sh"), None),
+        (("sinfo", "-h", "-N", "-O", SinfoData.sinfo_format), None),
+        (FORMAT_ARGS, SqueueData.squeue_env),
+        (("squeue", "--json"), None),
+    ]
+    for _ in range(2):
+        for args, env in commands:
+            recorder.save(args, env, await synthetic.run(args, env=env))
+
+
+async def best_of(repeat: int, stage: Callable) -> float:
+    """Best wall time of ``stage()`` in milliseconds, awaiting coroutines."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        if asyncio.iscoroutine(result):
+            await result
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def measure(directory: str, repeat: int) -> Dict[str, float]:
+    slurm = SlurmData(runner=ReplayRunner(directory))
+    squeue, sinfo = slurm.squeue_data, slurm.sinfo_data
+    timings = {}
+
+    previous = await squeue.fetch_squeue_format()
+    table = await squeue.fetch_squeue_format()  # Second recorded refresh
+    timings["fetch squeue --format"] = await best_of(repeat, squeue.fetch_squeue_format)
+    jobs = await squeue.fetch_squeue_json()
+    timings["fetch squeue --json"] = await best_of(repeat, squeue.fetch_squeue_json)
+    timings["process_job_data"] = await best_of(
+        repeat, lambda: squeue.process_job_data(jobs)
+    )
+    timings["diff_jobs"] = await best_of(
+        repeat, lambda: squeue.diff_jobs(previous, table)
+    )
+    diff = squeue.diff_jobs(previous, table)
+    metrics = JobMetrics()
+    metrics.rebuild(previous)
+    timings["JobMetrics.apply"] = await best_of(
+        repeat, lambda: metrics.copy().apply(previous, table, diff)
+    )
+    timings["JobMetrics.rebuild"] = await best_of(
+        repeat, lambda: JobMetrics().rebuild(table)
+    )
+    timings["fetch sinfo -N"] = await best_of(repeat, sinfo.fetch_data)
+    sinfo.data_raw = await sinfo.fetch_data()
+    timings["SinfoData.process_data"] = await best_of(repeat, sinfo.process_data)
+
+    def sort() -> List[int]:
+        table._sort_keys.clear()  # As on a new snapshot
+        return table.sorted_rows([("priority_number", True), ("job_id", False)])
+
+    timings["sort priority, job_id"] = await best_of(repeat, sort)
+
+    # Widget refreshes, in a headless app of a usual terminal size
+    app = ViewerApp(slurm)
+    async with app.run_test(size=(160, 50)) as pilot:
+        await pilot.pause()
+        viewer = app.query_one(SqueueViewer)
+        view = app.query_one(JobTableView)
+        viewer.shown_table = table
+        viewer.sort_spec = [("priority_number", True)]
+
+        def refresh_and_render() -> List:
+            table._sort_keys.clear()
+            viewer.apply_sort()
+            return [view.render_line(y) for y in range(view.size.height)]
+
+        def scroll_and_render() -> List:
+            view.scroll_to(y=len(table) // 2, animate=False, immediate=True)
+            lines = [view.render_line(y) for y in range(view.size.height)]
+            view.scroll_to(y=0, animate=False, immediate=True)
+            return lines
+
+        timings["SqueueViewer refresh+frame"] = await best_of(
+            repeat, refresh_and_render
+        )
+        timings["JobTableView scroll+frame"] = await best_of(repeat, scroll_and_render)
+
+        def filter_snapshot() -> List[int]:
+            table._indexes.clear()  # As on a new snapshot
+            table._folded.clear()
+            viewer._filtered = None
+            viewer.job_filter = JobFilter("user:user1 state:R")
+            viewer.apply_filter()
+            return view.order
+
+        shown = filter_snapshot()
+        timings["filter new snapshot"] = await best_of(repeat, filter_snapshot)
+        # A keystroke narrowing the filter only rechecks the rows it matched before
+        narrower = JobFilter("user:user12 state:R sim")
+        timings["filter keystroke"] = await best_of(
+            repeat, lambda: narrower.select(table, shown)
+        )
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", default="1000,10000,100000")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--replay", metavar="DIR", help="time a recorded session")
+    args = parser.parse_args()
+
+    results = {}
+    if args.replay:
+        results["replay"] = asyncio.run(measure(args.replay, args.repeat))
+    else:
+        for jobs in [int(jobs) for jobs in args.jobs.split(",")]:
+            with tempfile.TemporaryDirectory() as tmp:
+                asyncio.run(record_synthetic(tmp, args.partitions, jobs))
+                results[f"{jobs} jobs"] = asyncio.run(measure(tmp, args.repeat))
+
+    columns = list(results)
+    print(f"{'stage (ms)':>28}" + "".join(f"{column:>14}" for column in columns))
+    for stage in next(iter(results.values())):
+        print(
+            f"{stage:>28}"
+            + "".join(f"{results[column][stage]:14.2f}" for column in columns)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Peak memory of parsing a large ``squeue --json`` document.
+
+Compares the plain ``json.loads`` path with the streaming JobStreamParser fed
+from a file in pipe-sized chunks, on a synthetic document. "transient" is the
+part of the peak above the reduced jobs that are kept::
+
+    python benchmarks/bench_squeue_memory.py --jobs 100000
+"""
+
+import argparse
+import codecs
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from slurmtop._data import SqueueData
+from slurmtop._jsonstream import JobStreamParser
+from slurmtop._replay import synthetic_job
+from slurmtop._runner import CHUNK_SIZE
+
+
+def write_document(path: str, jobs: int) -> None:
+    with open(path, "w") as f:
+        f.write('{"meta": {"plugin": {"type": "openapi/v0.0.39"}}, "jobs": [')
+        for job_id in range(jobs):
+            if job_id:
+                f.write(",")
+            json.dump(synthetic_job(job_id, random), f)
+        f.write('], "last_update": {"number": 1700000000}, "errors": []}')
+
+
+def parse_loads(path: str) -> list:
+    with open(path, "r") as f:
+        text = f.read()  # As subprocess.run(...).stdout
+    jobs = json.loads(text)["jobs"]
+    return [{key: job[key] for key in SqueueData.raw_fields} for job in jobs]
+
+
+def parse_stream(path: str) -> list:
+    parser = JobStreamParser(SqueueData.raw_fields)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            parser.feed(decoder.decode(chunk))
+    return parser.close()
+
+
+def measure(name: str, parse, path: str) -> None:
+    """Report the peak, and the transient part of it above the kept jobs."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    jobs = parse(path)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>12}: {len(jobs)} jobs, peak {peak / 2**20:8.1f} MiB, "
+        f"transient {(peak - retained) / 2**20:8.1f} MiB, {elapsed:6.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "squeue.json")
+        write_document(path, args.jobs)
+        print(f"document: {os.path.getsize(path) / 2**20:.1f} MiB")
+        measure("json.loads", parse_loads, path)
+        measure("streaming", parse_stream, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Startup time: command line, imports and first paint of the job list.
+
+First paint is timed on a synthetic cluster whose Slurm commands take
+``--delay`` seconds, without and then with the snapshot cached by a previous
+session::
+
+    python benchmarks/bench_startup.py --jobs 10000 --delay 3
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+
+from slurmtop._data import SlurmData
+from slurmtop._replay import SyntheticRunner
+from slurmtop._squeue_widget import SqueueViewer
+from slurmtop.app import SlurmtopApp
+
+
+class SlowRunner(SyntheticRunner):
+    """A synthetic cluster behind a slow controller."""
+
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    async def _run(self, args, timeout, env=None, parser=None):
+        await asyncio.sleep(self.delay)
+        return await super()._run(args, timeout, env, parser)
+
+
+def best_subprocess(code: str, repeat: int) -> float:
+    """Best wall time of a fresh interpreter running ``code``, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def first_paint(cache_dir: str, jobs: int, delay: float, wait: bool) -> float:
+    """Seconds from the app creation to the first job list on screen."""
+    start = time.perf_counter()
+    runner = SlowRunner(delay, partitions=8, jobs=jobs)
+    app = SlurmtopApp(SlurmData(runner=runner, cache_dir=cache_dir))
+    async with app.run_test(size=(160, 50)) as pilot:
+        viewer = app.query_one(SqueueViewer)
+        while viewer.loading:
+            await pilot.pause(0.01)
+        elapsed = time.perf_counter() - start
+        # Let the live data arrive, so that it is cached on exit
+        while wait and app.slurm.is_stale("squeue"):
+            await pilot.pause(0.05)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--delay", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    version = best_subprocess(
+        "from slurmtop.cli import run; run(['--version'])", args.repeat
+    )
+    print(f"{'slurmtop --version':>28}: {version * 1000:8.1f} ms")
+    imports = best_subprocess("import slurmtop.app", args.repeat)
+    print(f"{'import slurmtop.app':>28}: {imports * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = asyncio.run(first_paint(cache_dir, args.jobs, args.delay, True))
+        print(f"{'first paint, no cache':>28}: {cold * 1000:8.1f} ms")
+        warm = asyncio.run(first_paint(cache_dir, args.jobs, args.delay, False))
+        print(f"{'first paint, cached':>28}: {warm * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
 from .__about__ import __version__
-from .app import run
+from .cli import run
 
 __all__ = ["run", "__version__"]
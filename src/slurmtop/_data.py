@@ -1,153 +1,902 @@
+import asyncio
+import fnmatch
 import json
 import os
-import subprocess
-import time
-from datetime import datetime
-from typing import Dict, List
+import platform
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
-from rich import box
-from rich.table import Table
-from rich.text import Text
+from ._facts import FactsCache
+from ._history import MetricHistory
+from ._jobdetail import JobDetailCache
+from ._jobtable import UNLIMITED, JobTable
+from ._jsonstream import JobStreamParser
+from ._metrics import JobMetrics
+from ._nodes import NodeStatus, PartitionStatus, SinfoSnapshot, gpu_count, node_category
+from ._probe import ChangeProbe
+from ._runner import (
+    CommandRunner,
+    SlurmCommandError,
+    UnsupportedCommandError,
+    cluster_args,
+)
+from ._scheduler import RefreshSource, Subscriber
+from ._snapshot import SnapshotCache
+from ._workers import WorkerPool
+
+# Base refresh period of each source, in seconds
+DEFAULT_INTERVALS = {"sinfo": 5.0, "squeue": 30.0}
+
+# Cluster name -> seconds allowed to its commands, None for the default timeout
+Clusters = Dict[str, Optional[float]]
 
 
 class SlurmData:
-    """Data Wrapper"""
+    """Data Wrapper and refresh scheduler shared by every widget.
+
+    Each source is fetched once per interval, only while it has subscribers,
+    and its immutable snapshot is published to all of them. With several
+    ``clusters``, each source fetches all of them concurrently and publishes
+    their merged data. With ``probe``, a refresh is skipped when the counters
+    of the controller did not change since the last fetch of the source, and
+    ``set_idle`` slows every source down while nobody looks at the data. With
+    ``workers``, job lists are parsed by that many processes, off the UI.
+    """
+
+    idle_slowdown = 6.0  # Factor of the intervals while idle
+
+    def __init__(
+        self,
+        runner: CommandRunner = None,
+        intervals: Dict = None,
+        cache_dir: str = None,
+        query: "SqueueQuery" = None,
+        clusters: Clusters = None,
+        probe: bool = False,
+        workers: int = 0,
+    ):
+        # A single runner shared by every source, so requests can be merged
+        self.runner = runner or CommandRunner()
+        self.profiler = self.runner.profiler  # Stage timings of every source
+        self.query = query or SqueueQuery()
+        self.clusters = dict(clusters or {})  # Empty for the default cluster
+        # Static facts are fetched once per session, and optionally persisted
+        self.facts = FactsCache(self.runner, cache_dir)
+        # Details of single jobs, only fetched when shown
+        self.details = JobDetailCache(self.runner)
+        # Partition and queue metrics, sampled at each refresh
+        self.history = MetricHistory(
+            os.path.join(cache_dir, f"history-{platform.node()}.jsonl")
+            if cache_dir is not None
+            else None
+        )
+        # Processes parsing the job lists, None to parse them in this one
+        self.pool = WorkerPool(workers) if workers else None
+        self.squeue_data = SqueueData(
+            self.runner, self.query, clusters=self.clusters, pool=self.pool
+        )
+        self.sinfo_data = SinfoData(self.runner, clusters=self.clusters)
+        intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        # Cheap check of the controller state, skipping unchanged refreshes,
+        # one check serving both sources within the shortest interval
+        self.probe = (
+            ChangeProbe(self.runner, self.clusters, max_age=min(intervals.values()))
+            if probe
+            else None
+        )
+
+        # Last snapshots of the previous session, drawn until live data comes
+        self.snapshots = (
+            SnapshotCache(
+                cache_dir,
+                self.query.to_args() + [self.query.name] + sorted(self.clusters),
+            )
+            if cache_dir is not None
+            else None
+        )
+
+        self.sources = {
+            "sinfo": RefreshSource("sinfo", self._refresh_sinfo, intervals["sinfo"]),
+            "squeue": RefreshSource(
+                "squeue", self._refresh_squeue, intervals["squeue"]
+            ),
+        }
+        self._failure = None  # Future holding the first poller error
+
+    async def _refresh_sinfo(self) -> "SinfoSnapshot":
+        # A cycle ends when the next one starts, once its snapshot is rendered
+        self.profiler.flush("sinfo")
+        if not await self._changed("sinfo"):
+            return None
+        with self.profiler.time("sinfo", "refresh"):
+            snapshot = await self.sinfo_data.refresh_data()
+        if snapshot is None:
+            self._fetch_failed("sinfo")
+        else:
+            values = {}
+            for partition in snapshot.partitions:
+                p_name = partition.label
+                values[f"sinfo/{p_name}/alloc"] = partition.alloc
+                values[f"sinfo/{p_name}/idle"] = partition.idle
+                values[f"sinfo/{p_name}/other"] = partition.other
+                values[f"sinfo/{p_name}/usage"] = partition.load
+                if partition.cpus_total:
+                    values[f"sinfo/{p_name}/cpus_alloc"] = partition.cpus_alloc
+                if partition.gpus_total:
+                    values[f"sinfo/{p_name}/gpus_alloc"] = partition.gpus_alloc
+            self.history.record(values)
+        return snapshot
+
+    async def _refresh_squeue(self) -> "SqueueSnapshot":
+        self.profiler.flush("squeue")
+        if not await self._changed("squeue"):
+            return None
+        with self.profiler.time("squeue", "refresh"):
+            snapshot = await self.squeue_data.refresh()
+        if snapshot is None:
+            self._fetch_failed("squeue")
+        else:
+            # States that emptied since the last sample count as 0
+            values = dict.fromkeys(self.history.keys("squeue/"), 0)
+            for state, count in Counter(snapshot.table.job_state).items():
+                values[f"squeue/{state}"] = count
+            self.history.record(values)
+        return snapshot
+
+    async def _changed(self, source: str) -> bool:
+        """Whether ``source`` should be fetched, according to the probe."""
+        if self.probe is None:
+            return True
+        with self.profiler.time(source, "probe"):
+            return await self.probe.changed(source)
+
+    def _fetch_failed(self, source: str) -> None:
+        if self.probe is not None:
+            self.probe.forget(source)
+
+    def set_idle(self, idle: bool) -> None:
+        """Poll ``idle_slowdown`` times slower while nobody looks at the data.
+
+        Once back, a source older than its interval is refreshed at once.
+        """
+        for source in self.sources.values():
+            source.set_slowdown(self.idle_slowdown if idle else 1.0)
+
+    def subscribe(self, source: str, callback: Subscriber) -> None:
+        """Call ``callback`` with every new snapshot of ``source``."""
+        refresh_source = self.sources[source]
+        refresh_source.subscribers.append(callback)
+        if refresh_source.snapshot is not None:
+            callback(refresh_source.snapshot)
+        if self._failure is not None and refresh_source.task is None:
+            self._start_polling(refresh_source)
+
+    def unsubscribe(self, source: str, callback: Subscriber) -> None:
+        refresh_source = self.sources[source]
+        if callback in refresh_source.subscribers:
+            refresh_source.subscribers.remove(callback)
+
+    def refresh_now(self, source: str) -> None:
+        """Refresh ``source`` without waiting for the end of its interval."""
+        self.sources[source].refresh_now()
+
+    def is_stale(self, source: str) -> bool:
+        """Whether the snapshot of ``source`` is a cached one, not live data."""
+        return self.sources[source].stale
+
+    async def run(self) -> None:
+        """Poll every subscribed source until cancelled, or a poller fails.
+
+        Cached snapshots are published while the first live ones are fetched,
+        and the last live ones are saved when polling stops.
+        """
+        self._failure = asyncio.get_event_loop().create_future()
+        for source in self.sources.values():
+            if source.subscribers:
+                self._start_polling(source)
+        try:
+            await self.restore()
+            await self._failure
+        finally:
+            self._failure = None
+            for source in self.sources.values():
+                if source.task is not None:
+                    source.task.cancel()
+                    source.task = None
+            self.save()
+            self.profiler.close()
+            if self.pool is not None:
+                self.pool.close()
+
+    async def restore(self) -> None:
+        """Publish the cached snapshots of sources without live data yet."""
+        if self.snapshots is None:
+            return
+        loop = asyncio.get_event_loop()
+        cached = await loop.run_in_executor(None, self.snapshots.load)
+        if cached is None:
+            return
+        sinfo_snapshot, table = cached
+        sinfo, squeue = self.sources["sinfo"], self.sources["squeue"]
+        if sinfo.snapshot is None:
+            self.sinfo_data.data = sinfo_snapshot
+            sinfo.publish(sinfo_snapshot, stale=True)
+        if squeue.snapshot is None:
+            squeue.publish(self.squeue_data.update(table), stale=True)
+
+    def save(self) -> None:
+        """Save the live snapshots for the next session."""
+        squeue = self.sources["squeue"]
+        if self.snapshots is None or squeue.snapshot is None or squeue.stale:
+            return
+        self.snapshots.save(
+            self.sources["sinfo"].snapshot or SinfoSnapshot(()), squeue.snapshot.table
+        )
 
-    def __init__(self):
-        self.squeue_data = SqueueData()
-        self.sinfo_data = SinfoData()
+    def _start_polling(self, source: RefreshSource) -> None:
+        source.task = asyncio.ensure_future(source.poll())
+        source.task.add_done_callback(self._on_poller_done)
+
+    def _on_poller_done(self, task: asyncio.Future) -> None:
+        if task.cancelled() or self._failure is None or self._failure.done():
+            return
+        self._failure.set_exception(task.exception())
 
 
 class SinfoData:
-    """Handles data retrieval and processing for the partition status list."""
+    """Handles data retrieval and processing for the partition status list.
+
+    Partitions are aggregated from a per node status list, fetched with a
+    single ``sinfo -N`` call per cluster. Without it, e.g. on a replayed
+    session, the ``sinfo -s`` summary gives node counts only.
+    """
+
+    timeout = 10.0  # Seconds allowed to `sinfo` before giving up
+    # One line per node and partition, "|" separated, without padding
+    sinfo_format = (
+        "PartitionName:0|,NodeList:0|,StateLong:0|,CPUsState:0|,Gres:0|,GresUsed:0"
+    )
 
-    def __init__(self):
+    def __init__(self, runner: CommandRunner, clusters: Clusters = None):
+        self.runner = runner
+        # Clusters fetched as partition summaries, without the node status list
+        self.summarized: Set[str] = set()
+        self.clusters = dict(clusters or {})  # Empty for the default cluster
+        self.cluster_data: Dict[str, SinfoSnapshot] = {}  # Last of each cluster
         self.data_raw = []
-        self.data = []
-        self.refresh_data()  # refresh data_raw & data
+        self.data = SinfoSnapshot(())
+
+    async def fetch_data(self, cluster: str = "") -> List[Tuple]:
+        """Fetch and parse the node (or partition) lines of sinfo.
+
+        A cluster whose sinfo rejects the node status list, or whose output
+        is not understood, gets partition summaries from then on, once one
+        was fetched: a timeout or an unreachable controller changes nothing.
+        """
+        if cluster not in self.summarized:
+            try:
+                return await self.fetch_nodes(cluster)
+            except UnsupportedCommandError as e:
+                error = e
+        summary = await self.fetch_summary(cluster)
+        if cluster not in self.summarized:
+            print(f"Falling back to sinfo -s: {error}")
+            self.summarized.add(cluster)
+        return summary
+
+    async def fetch_summary(self, cluster: str = "") -> List[PartitionStatus]:
+        output = await self.runner.run(
+            ["sinfo", "-sh"] + cluster_args(cluster),
+            timeout=self.clusters.get(cluster) or self.timeout,
+        )
+        try:
+            with self.runner.profiler.time("sinfo", "parse"):
+                return [
+                    self.parse_summary_line(line)
+                    for line in output.splitlines()
+                    if not line.startswith("CLUSTER: ")
+                ]
+        except (ValueError, IndexError) as e:
+            raise SlurmCommandError(f"Invalid sinfo output: {e}") from e
 
-    def fetch_data(self) -> List[str]:
-        """Fetch the raw data directly from sinfo cmd"""
+    async def fetch_nodes(self, cluster: str = "") -> List[Tuple[str, NodeStatus]]:
+        output = await self.runner.run(
+            ["sinfo", "-h", "-N", "-O", self.sinfo_format] + cluster_args(cluster),
+            timeout=self.clusters.get(cluster) or self.timeout,
+        )
         try:
-            bash_command = "sinfo -sh"
-            process = subprocess.run(
-                bash_command, shell=True, stdout=subprocess.PIPE, encoding="utf-8"
+            with self.runner.profiler.time("sinfo", "parse"):
+                return [
+                    self.parse_node_line(line)
+                    for line in output.splitlines()
+                    if not line.startswith("CLUSTER: ")
+                ]
+        except (ValueError, IndexError) as e:
+            raise UnsupportedCommandError(f"Invalid sinfo output: {e}") from e
+
+    @staticmethod
+    def parse_summary_line(line: str) -> PartitionStatus:
+        """Parse a ``sinfo -sh`` line, whose 4th field is nodes A/I/O/T."""
+        fields = line.split()
+        alloc, idle, other, total = map(int, fields[3].split("/"))
+        usage = round((alloc + other) / total * 100, 2) if total else 0.0
+        return PartitionStatus(fields[0], alloc, idle, other, usage)
+
+    @staticmethod
+    def parse_node_line(line: str) -> Tuple[str, NodeStatus]:
+        """Parse a ``sinfo_format`` line into its partition and node status."""
+        partition, name, state, cpus, gres, gres_used = line.split("|")
+        cpus_alloc, cpus_idle, cpus_other, _ = map(int, cpus.split("/"))
+        node = NodeStatus(
+            name.strip(),
+            state.strip(),
+            (partition.strip(),),
+            cpus_alloc,
+            cpus_idle,
+            cpus_other,
+            gpu_count(gres_used),
+            gpu_count(gres),
+        )
+        return node.partitions[0], node
+
+    def process_data(self, data_raw: List = None, cluster: str = "") -> SinfoSnapshot:
+        """Aggregate the raw data into partition and node status lists."""
+        if data_raw is None:
+            data_raw = self.data_raw
+        if data_raw and isinstance(data_raw[0], PartitionStatus):
+            # Summary lines, the node status list is unknown
+            return SinfoSnapshot(
+                tuple(status._replace(cluster=cluster) for status in data_raw)
             )
-            output = process.stdout.splitlines()
-            data_raw = [line.split() for line in output]
-            return data_raw
-        except subprocess.CalledProcessError as e:
-            print(f"Error fetching data: {e}")
-            return []
+        # name -> node counts A/I/O, then the CPU and GPU sums of its nodes
+        partitions: Dict[str, List[int]] = {}
+        nodes: Dict[str, NodeStatus] = {}
+        for partition, node in data_raw:
+            counts = partitions.get(partition)
+            if counts is None:
+                counts = partitions[partition] = [0] * 8
+            counts[node_category(node.state)] += 1
+            for field, value in enumerate(node[3:8], 3):
+                counts[field] += value
+            # Nodes of several partitions have one line per partition
+            previous = nodes.get(node.name)
+            if previous is not None:
+                node = previous._replace(partitions=previous.partitions + (partition,))
+            elif cluster:
+                node = node._replace(cluster=cluster)
+            nodes[node.name] = node
+        statuses = []
+        for name, (alloc, idle, other, *cpus_gpus) in partitions.items():
+            total = alloc + idle + other
+            usage = round((alloc + other) / total * 100, 2) if total else 0.0
+            statuses.append(
+                PartitionStatus(name, alloc, idle, other, usage, *cpus_gpus, cluster)
+            )
+        return SinfoSnapshot(tuple(statuses), tuple(nodes.values()))
+
+    async def refresh_data(self) -> SinfoSnapshot:
+        """Refresh data_raw & data, keeping the previous ones on failure.
+
+        Returns the new immutable snapshot, or None on failure.
+        """
+        if not self.clusters:
+            try:
+                self.data_raw = await self.fetch_data()
+            except SlurmCommandError as e:
+                print(f"Error fetching data: {e}")
+                return None
+            with self.runner.profiler.time("sinfo", "process"):
+                self.data = self.process_data()
+            return self.data
+        # Every cluster at once, a failing one keeps its previous status
+        results = await asyncio.gather(
+            *(self.fetch_data(cluster) for cluster in self.clusters),
+            return_exceptions=True,
+        )
+        for cluster, result in zip(self.clusters, results):
+            if isinstance(result, SlurmCommandError):
+                print(f"Error fetching data of {cluster}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                with self.runner.profiler.time("sinfo", "process"):
+                    self.cluster_data[cluster] = self.process_data(result, cluster)
+        if not self.cluster_data:
+            return None
+        snapshots = [
+            self.cluster_data[cluster]
+            for cluster in self.clusters
+            if cluster in self.cluster_data
+        ]
+        self.data = SinfoSnapshot(
+            tuple(status for snapshot in snapshots for status in snapshot.partitions),
+            tuple(node for snapshot in snapshots for node in snapshot.nodes),
+        )
+        return self.data
+
+
+class SqueueDiff:
+    """Keyed delta between two job snapshots, indexed by ``job_key``."""
+
+    def __init__(
+        self,
+        added: List[int] = None,
+        removed: List[int] = None,
+        changed: Dict[int, Tuple[str, ...]] = None,
+    ):
+        self.added = added or []  # New job keys, in snapshot order
+        self.removed = removed or []  # Job keys that left the queue
+        self.changed = changed or {}  # job_key -> keys whose value changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+
+# Short state codes accepted by `squeue --states`, and their long names
+JOB_STATE_CODES = {
+    "BF": "BOOT_FAIL",
+    "CA": "CANCELLED",
+    "CD": "COMPLETED",
+    "CF": "CONFIGURING",
+    "CG": "COMPLETING",
+    "DL": "DEADLINE",
+    "F": "FAILED",
+    "NF": "NODE_FAIL",
+    "OOM": "OUT_OF_MEMORY",
+    "PD": "PENDING",
+    "PR": "PREEMPTED",
+    "R": "RUNNING",
+    "RD": "RESV_DEL_HOLD",
+    "RF": "REQUEUE_FED",
+    "RH": "REQUEUE_HOLD",
+    "RQ": "REQUEUED",
+    "RS": "RESIZING",
+    "RV": "REVOKED",
+    "S": "SUSPENDED",
+    "SE": "SPECIAL_EXIT",
+    "SI": "SIGNALING",
+    "SO": "STAGE_OUT",
+    "ST": "STOPPED",
+    "TO": "TIMEOUT",
+}
 
-    def process_data(self) -> List[List[int]]:
-        """Process the raw data to provide a practical partition list"""
-        data = []
-        for partition in self.data_raw:
-            p_name = partition[0][:]
-            p_alloc, p_idle, p_other, p_total = [
-                eval(i) for i in partition[3].split("/")
-            ]
-            p_ratio_usage = round((p_alloc + p_other) / p_total * 100, 2)
-            data.append([p_name, p_alloc, p_idle, p_other, p_ratio_usage])
-        return data
 
-    def refresh_data(self):
-        self.data_raw = self.fetch_data()
-        self.data = self.process_data()
+class SqueueQuery:
+    """Job selection, pushed down to the squeue command line.
+
+    Every criterion is a list of accepted values, empty meaning "any". ``name``
+    is a shell-style pattern: exact names are pushed down with ``--name``,
+    wildcards can only be matched client side.
+    """
+
+    def __init__(
+        self,
+        users: List[str] = None,
+        partitions: List[str] = None,
+        states: List[str] = None,
+        accounts: List[str] = None,
+        name: str = None,
+    ):
+        self.users = list(users or [])
+        self.partitions = list(partitions or [])
+        self.states = [JOB_STATE_CODES.get(s.upper(), s.upper()) for s in states or []]
+        self.accounts = list(accounts or [])
+        self.name = name
+
+    @property
+    def name_is_pattern(self) -> bool:
+        return self.name is not None and any(c in self.name for c in "*?[")
+
+    def to_args(self) -> List[str]:
+        """squeue options selecting the jobs matched by this query."""
+        args = []
+        if self.users:
+            args.append("--user=" + ",".join(self.users))
+        if self.partitions:
+            args.append("--partition=" + ",".join(self.partitions))
+        if self.states:
+            args.append("--states=" + ",".join(self.states))
+        if self.accounts:
+            args.append("--account=" + ",".join(self.accounts))
+        if self.name is not None and not self.name_is_pattern:
+            args.append("--name=" + self.name)
+        return args
+
+    def matches_name(self, name: str) -> bool:
+        return self.name is None or fnmatch.fnmatchcase(name, self.name)
+
+    def matches(self, job: Dict) -> bool:
+        """Client-side check of a raw job, for what squeue could not filter."""
+        if self.users and job.get("user_name") not in self.users:
+            return False
+        if self.partitions and not set(job.get("partition", "").split(",")) & set(
+            self.partitions
+        ):
+            return False
+        if self.states and not set(job.get("job_state", [])) & set(self.states):
+            return False
+        if self.accounts and job.get("account") not in self.accounts:
+            return False
+        return self.matches_name(job.get("name", ""))
+
+
+class SqueueSnapshot(NamedTuple):
+    """Immutable view of the job list, as published to subscribers."""
+
+    table: JobTable
+    diff: SqueueDiff  # Delta from the previous generation
+    generation: int
+    metrics: JobMetrics  # Aggregates of ``table``
 
 
 class SqueueData:
-    """Handles data retrieval and processing for the job list."""
+    """Handles data retrieval and processing for the job list.
+
+    With several ``clusters``, their job lists are fetched concurrently, each
+    within its own timeout, and merged into a single table with a cluster
+    column. A cluster that fails keeps its previous jobs. With a ``pool``,
+    outputs are parsed by its worker processes.
+    """
+
+    timeout = 60.0  # Seconds allowed to `squeue` before giving up
+
+    # Lean fetch: only the needed fields, "|"-separated, the free-form job name
+    # last. Times are printed as epoch seconds through SLURM_TIME_FORMAT.
+    squeue_format = "%A|%P|%u|%T|%S|%D|%Q|%N|%r|%l|%j"
+    squeue_env = {"SLURM_TIME_FORMAT": "%s"}
 
-    def __init__(self):
+    # Raw fields kept from each `squeue --json` job, everything else is dropped
+    raw_fields = (
+        "job_id",
+        "partition",
+        "name",
+        "user_name",
+        "account",
+        "job_state",
+        "node_count",
+        "nodes",
+        "priority",
+        "start_time",
+        "state_reason",
+        "time_limit",
+    )
+
+    def __init__(
+        self,
+        runner: CommandRunner,
+        query: SqueueQuery = None,
+        stream_json: bool = True,
+        clusters: Clusters = None,
+        pool: WorkerPool = None,
+    ):
+        self.runner = runner
+        self.query = query or SqueueQuery()
+        self.pool = pool
+        self.clusters = dict(clusters or {})  # Empty for the default cluster
+        self.cluster_tables: Dict[str, JobTable] = {}  # Last of each cluster
+        self.lean = True  # Use `squeue --format`, falling back to `--json`
+        # Parse `--json` incrementally from the pipe, with bounded memory
+        self.stream_json = stream_json
         # Define the keys to be selected for display
-        self.keys = [
-            "job_id",
-            "partition",
-            "name",
-            "user_name",
-            "job_state",
-            "time_elapse",
-            "node_number",
-            "nodes",
-            "priority_number",
-        ]
+        self.keys = (["cluster"] if self.clusters else []) + list(JobTable.keys)
+        # Columns compared by diff_jobs, the aggregated ones included. The
+        # clock columns change with the time alone, their sources are compared
+        self.diff_keys = [key for key in self.keys if key not in JobTable.clock_keys]
+        self.diff_keys += ["start_time", "time_limit", "reason"]
         # Load initial job data
-        self.jobs = []
-        self.refresh()
+        self.table = JobTable()
+        self.diff = SqueueDiff()
+        self.generation = 0  # Bumped on every refresh, `diff` leads to it
+        self.metrics = JobMetrics()  # Aggregates of `table`, patched by `diff`
+
+    async def fetch_squeue_data(self, cluster: str = "") -> JobTable:
+        """Fetches the job list of a cluster using the squeue command.
+
+        The lean ``--format`` path is used unless squeue rejected it where
+        ``--json`` worked, in which case the JSON path is kept for the
+        session. Any other failure, e.g. a timeout, fails the refresh, and the
+        next one tries the lean path again.
+        """
+        if self.lean:
+            try:
+                return await self.fetch_squeue_format(cluster)
+            except UnsupportedCommandError as e:
+                table = await self.fetch_squeue_json_table(cluster)
+                print(f"Falling back to squeue --json: {e}")
+                self.lean = False
+                return table
+        return await self.fetch_squeue_json_table(cluster)
+
+    async def fetch_clusters(self) -> JobTable:
+        """Fetch the job lists of every cluster at once, merged.
+
+        The refresh takes as long as the slowest cluster, bounded by its
+        timeout, rather than the sum of them all.
+        """
+        results = await asyncio.gather(
+            *(self.fetch_squeue_data(cluster) for cluster in self.clusters),
+            return_exceptions=True,
+        )
+        tables = []
+        for cluster, result in zip(self.clusters, results):
+            if isinstance(result, SlurmCommandError):
+                print(f"Error fetching data of {cluster}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                self.cluster_tables[cluster] = result
+            # Empty until first fetched, so that every cluster keeps its index
+            tables.append(self.cluster_tables.get(cluster, JobTable()))
+        if not self.cluster_tables:
+            raise SlurmCommandError("No cluster could be reached")
+        with self.runner.profiler.time("squeue", "process"):
+            return JobTable.merge(tables)
+
+    async def fetch_squeue_format(self, cluster: str = "") -> JobTable:
+        """Fetch only the needed fields with ``squeue --format``."""
+        output = await self.runner.run(
+            ["squeue", "-h", "-o", self.squeue_format]
+            + self.query.to_args()
+            + cluster_args(cluster),
+            timeout=self.clusters.get(cluster) or self.timeout,
+            env=self.squeue_env,
+        )
+        try:
+            with self.runner.profiler.time("squeue", "parse"):
+                if self.pool is None:
+                    return parse_squeue_output(output, self.query, cluster)
+                # Shards of whole lines, parsed concurrently and kept in order
+                tables = await asyncio.gather(
+                    *(
+                        self.pool.run(parse_squeue_output, shard, self.query, cluster)
+                        for shard in self.pool.shards(output)
+                    )
+                )
+                return JobTable.concat(tables)
+        except (ValueError, IndexError) as e:
+            raise UnsupportedCommandError(f"Invalid squeue output: {e}") from e
+
+    @staticmethod
+    def parse_squeue_line(
+        table: JobTable, line: str, query: SqueueQuery, cluster: str = ""
+    ) -> None:
+        """Parse one ``squeue_format`` line into ``table``."""
+        (
+            job_id,
+            partition,
+            user,
+            state,
+            start,
+            nodes,
+            priority,
+            nodelist,
+            reason,
+            time_limit,
+            name,
+        ) = line.split("|", 10)
+        if not query.matches_name(name):
+            return
+        table.append(
+            int(job_id),
+            partition,
+            name,
+            user,
+            state,
+            int(nodes),
+            "" if nodelist == "(null)" else nodelist,
+            int(priority),
+            int(start) if start.isdigit() else 0,
+            reason,
+            time_to_seconds(time_limit),
+            cluster,
+        )
+
+    async def fetch_squeue_json(self, cluster: str = "") -> List[Dict]:
+        """Fetch the full raw job list with ``squeue --json``.
 
-    def fetch_squeue_data(self) -> List[Dict]:
-        """Fetches the raw job list using the squeue command."""
+        squeue ignores filtering options along with --json, so the query is
+        applied client side.
+        """
+        args = ["squeue", "--json"] + cluster_args(cluster)
+        timeout = self.clusters.get(cluster) or self.timeout
+        if self.stream_json:
+            return await self.runner.run(args, timeout=timeout, parser=self.json_parser)
+        output = await self.runner.run(args, timeout=timeout)
         try:
-            bash_command = "squeue --json"
-            process = subprocess.run(
-                bash_command, shell=True, stdout=subprocess.PIPE, encoding="utf-8"
+            with self.runner.profiler.time("squeue", "parse"):
+                return parse_squeue_json(output, self.query)
+        except ValueError as e:
+            raise SlurmCommandError(f"Invalid squeue output: {e}") from e
+
+    async def fetch_squeue_json_table(self, cluster: str = "") -> JobTable:
+        """Fetch the job list of a cluster with ``squeue --json``, processed.
+
+        With a ``pool``, the whole output is parsed and processed by a worker
+        process, and only the job table comes back.
+        """
+        if self.pool is None:
+            jobs = await self.fetch_squeue_json(cluster)
+            with self.runner.profiler.time("squeue", "process"):
+                return self.process_job_data(jobs, cluster=cluster)
+        output = await self.runner.run(
+            ["squeue", "--json"] + cluster_args(cluster),
+            timeout=self.clusters.get(cluster) or self.timeout,
+        )
+        try:
+            with self.runner.profiler.time("squeue", "parse"):
+                return await self.pool.run(
+                    process_squeue_json, output, self.query, cluster, self.stream_json
+                )
+        except ValueError as e:
+            raise SlurmCommandError(f"Invalid squeue output: {e}") from e
+
+    def json_parser(self) -> JobStreamParser:
+        """Streaming parser keeping only the raw fields of matching jobs."""
+        return JobStreamParser(self.raw_fields, keep=self.query.matches)
+
+    @staticmethod
+    def process_job_data(
+        jobs: List[Dict], max_jobs: int = None, cluster: str = ""
+    ) -> JobTable:
+        """Process the raw JSON jobs into a typed job table ready to visualize."""
+        table = JobTable()
+        for job in jobs if max_jobs is None else jobs[:max_jobs]:
+            table.append(
+                job["job_id"],
+                job["partition"],
+                job["name"],
+                job["user_name"],
+                job["job_state"][0],
+                job["node_count"]["number"],
+                job["nodes"],
+                job["priority"]["number"],
+                job["start_time"]["number"],
+                job.get("state_reason", "None"),
+                _time_limit(job.get("time_limit")),
+                cluster,
             )
-            data = json.loads(process.stdout)  # Load JSON output
-            return data["jobs"]  # Extract the list of jobs from the JSON response
-        except subprocess.CalledProcessError as e:
-            print(f"Error fetching data: {e}")
-            return []
-
-    def process_job_data(self, jobs: List[Dict], max_jobs: int = None) -> List[Dict]:
-        """Process the raw data to provide a practical job list ready to visualize."""
-        processed_jobs = []
-        for job in jobs:
-            # Compute and format "Time"
-            job["node_number"] = job["node_count"]["number"]
-            job["priority_number"] = job["priority"]["number"]
-            job["job_state"] = job["job_state"][0]
-
-            # Get start time (time_t type) and subtract it to current time
-            # Generate a human readable time elapse like dd:hh:mm:ss
-            if job["start_time"]["number"] > 0:
-                start_time = datetime.fromtimestamp(job["start_time"]["number"])
-                end_time = datetime.now()
-                if end_time < start_time:
-                    time_elapse = ""
-                else:
-                    time_elapse = str(end_time - start_time).split(".")[0]
+        return table
+
+    def diff_jobs(self, previous: JobTable, table: JobTable) -> SqueueDiff:
+        """Compute the keyed delta turning ``previous`` into ``table``."""
+        diff = SqueueDiff()
+        # The compared values of every row zipped at once, so that an
+        # unchanged job, most of them, costs a single tuple comparison
+        columns = [JobTable.aliases.get(key, key) for key in self.diff_keys]
+        previous_values = {
+            job_key: row_values
+            for job_key, row_values in zip(
+                previous.job_key, zip(*(getattr(previous, c) for c in columns))
+            )
+        }
+        values = zip(*(getattr(table, column) for column in columns))
+        for job_key, row_values in zip(table.job_key, values):
+            old_values = previous_values.get(job_key)
+            if old_values is None:
+                diff.added.append(job_key)
+            elif old_values != row_values:
+                diff.changed[job_key] = tuple(
+                    key
+                    for key, old, new in zip(self.diff_keys, old_values, row_values)
+                    if old != new
+                )
+        rows = table.rows
+        diff.removed = [key for key in previous.job_key if key not in rows]
+        return diff
+
+    async def refresh(self) -> SqueueSnapshot:
+        """Refresh the job list, keeping the previous one on failure.
+
+        Returns the new snapshot, or None on failure.
+        """
+        try:
+            if self.clusters:
+                table = await self.fetch_clusters()
             else:
-                time_elapse = ""
+                table = await self.fetch_squeue_data()
+        except SlurmCommandError as e:
+            print(f"Error fetching data: {e}")
+            return None
+        diff = None
+        if self.pool is not None:
+            # Diffed in a thread, which hands the GIL back to the UI every
+            # few milliseconds, instead of holding the event loop throughout
+            previous = self.table
+            loop = asyncio.get_event_loop()
+            with self.runner.profiler.time("squeue", "diff"):
+                diff = await loop.run_in_executor(None, self.diff_jobs, previous, table)
+            if self.table is not previous:  # Replaced meanwhile, e.g. restored
+                diff = None
+        return self.update(table, diff)
 
-            job["time_elapse"] = time_elapse
+    def update(self, table: JobTable, diff: SqueueDiff = None) -> SqueueSnapshot:
+        """Make ``table`` the current job list and return its snapshot.
 
-            processed_job = {
-                key: (str(job.get(key))[:17] + "...")
-                if len(str(job.get(key))) > 20
-                else str(job.get(key, ""))
-                for key in self.keys
-            }
-            processed_jobs.append(processed_job)
+        ``diff`` is the delta from the current job list, if already computed.
+        """
+        with self.runner.profiler.time("squeue", "diff"):
+            if diff is None:
+                diff = self.diff_jobs(self.table, table)
+            self.diff = diff
+            self.metrics.apply(self.table, table, self.diff)
+        self.table = table
+        self.generation += 1
+        return self.snapshot()
 
-        return processed_jobs if max_jobs is None else processed_jobs[:max_jobs]
+    def snapshot(self) -> SqueueSnapshot:
+        return SqueueSnapshot(
+            self.table, self.diff, self.generation, self.metrics.copy()
+        )
 
-    def refresh(self):
-        self.jobs = self.process_job_data(self.fetch_squeue_data())
+
+def parse_squeue_output(output: str, query: SqueueQuery, cluster: str = "") -> JobTable:
+    """Job table of a ``SqueueData.squeue_format`` output.
+
+    Raises ValueError or IndexError on an invalid line.
+    """
+    table = JobTable()
+    for line in output.splitlines():
+        if not line.startswith("CLUSTER: "):
+            SqueueData.parse_squeue_line(table, line, query, cluster)
+    return table
+
+
+def parse_squeue_json(output: str, query: SqueueQuery, stream: bool = False) -> List:
+    """Raw jobs of a ``squeue --json`` output matching ``query``.
+
+    With ``stream``, the jobs are decoded and reduced one at a time rather
+    than all at once, slower but without the whole document as objects.
+    """
+    if stream:
+        parser = JobStreamParser(SqueueData.raw_fields, keep=query.matches)
+        parser.feed(output)
+        return parser.close()
+    jobs = json.loads(output)["jobs"]  # Extract the list of jobs
+    return [job for job in jobs if query.matches(job)]
+
+
+def process_squeue_json(
+    output: str, query: SqueueQuery, cluster: str = "", stream: bool = False
+) -> JobTable:
+    """Job table of a ``squeue --json`` output, parsed and processed."""
+    jobs = parse_squeue_json(output, query, stream)
+    return SqueueData.process_job_data(jobs, cluster=cluster)
 
 
 def time_to_seconds(time_str: str) -> int:
-    """Convert time string in D-HH:MM:SS, HH:MM:SS, or MM:SS format to total seconds."""
+    """Seconds of a Slurm duration, e.g. a time limit printed by squeue.
+
+    Every Slurm format is accepted: M, M:S, H:M:S, D-H, D-H:M and D-H:M:S.
+    UNLIMITED and INFINITE give UNLIMITED, anything invalid (e.g. NOT_SET) 0.
+    """
+    if time_str in ("UNLIMITED", "INFINITE"):
+        return UNLIMITED
+    days, _, clock = time_str.rpartition("-")
     try:
-        # If the format includes days, D-HH:MM:SS
-        if "-" in time_str:
-            days, time_part = time_str.split("-")
-            time_obj = datetime.strptime(time_part, "%H:%M:%S")
-            return (
-                int(days) * 86400
-                + time_obj.hour * 3600  # Days to seconds
-                + time_obj.minute * 60
-                + time_obj.second
-            )
-        # If the format is HH:MM:SS
-        elif time_str.count(":") == 2:
-            time_obj = datetime.strptime(time_str, "%H:%M:%S")
-            return time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second
-        # If the format is MM:SS
-        elif time_str.count(":") == 1:
-            time_obj = datetime.strptime(time_str, "%M:%S")
-            return time_obj.minute * 60 + time_obj.second
+        parts = [int(part) for part in clock.split(":")]
+        if days:
+            if len(parts) > 3:
+                return 0
+            hours, minutes, seconds = parts + [0] * (3 - len(parts))
+            return ((int(days) * 24 + hours) * 60 + minutes) * 60 + seconds
+        if len(parts) == 1:
+            return parts[0] * 60
+        if len(parts) == 2:
+            return parts[0] * 60 + parts[1]
+        if len(parts) == 3:
+            return (parts[0] * 60 + parts[1]) * 60 + parts[2]
     except ValueError:
-        # In case of an invalid time format, return 0 as fallback
-        return 0
+        pass
+    return 0
+
+
+def _time_limit(value) -> int:
+    """Seconds of a ``squeue --json`` time limit, in minutes."""
+    if isinstance(value, dict):
+        if value.get("infinite"):
+            return UNLIMITED
+        value = value.get("number") if value.get("set") else 0
+    return (value or 0) * 60
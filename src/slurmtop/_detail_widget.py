@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import List, Tuple
+
+from rich.console import Group
+from rich.markup import escape
+from rich.table import Table
+from rich.text import Text
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import VerticalScroll
+from textual.widgets import Static
+
+from ._data import SlurmData
+from ._jobdetail import JobDetail
+from ._runner import SlurmCommandError
+
+
+class JobDetailPane(VerticalScroll, can_focus=False):
+    """Detail of the job under the cursor, from scontrol or sacct.
+
+    A job is only fetched once the cursor rests on it for ``delay`` seconds,
+    so that scrolling through the list does not query the controller. The
+    ``prefetch`` neighbours of the job are then fetched in the background, one
+    at a time. Moving on cancels whatever has not been fetched yet.
+    """
+
+    DEFAULT_CSS = """
+    JobDetailPane {
+        dock: right;
+        width: 56;
+        height: 100%;
+        border-left: solid #33ffbe;
+        padding: 0 1;
+        scrollbar-size: 1 1;
+        display: none;
+    }
+    """
+
+    delay = 0.25  # Seconds the cursor rests on a job before it is fetched
+    prefetch = 2  # Jobs prefetched on either side of the cursor
+
+    def __init__(self, slurm: SlurmData):
+        super().__init__()
+        self.slurm = slurm
+        self.job = None  # (job id, cluster) shown
+
+    def compose(self) -> ComposeResult:
+        yield Static()
+
+    def show_job(
+        self, job: Tuple[int, str], neighbours: List[Tuple[int, str]], wait=True
+    ) -> None:
+        """Show a (job id, cluster), cached if possible, and prefetch others."""
+        self.job = job
+        detail = self.slurm.details.cached(*job)
+        if detail is not None:
+            self.draw(detail)
+        else:
+            self.query_one(Static).update(f"{_title(*job)}\n\nLoading…")
+        # Cached or not, nothing is fetched before the cursor rests
+        self.load(job, neighbours, self.delay if wait else 0.0)
+
+    @work(exclusive=True, group="job-detail")
+    async def load(
+        self, job: Tuple[int, str], neighbours: List[Tuple[int, str]], delay: float
+    ) -> None:
+        # Cancelled by the next call, when the cursor moves on
+        await asyncio.sleep(delay)
+        try:
+            detail = await self.slurm.details.get(*job)
+        except SlurmCommandError as e:
+            self.query_one(Static).update(f"{_title(*job)}\n\n[red]{escape(str(e))}")
+        else:
+            self.draw(detail)
+        for neighbour in neighbours:
+            try:
+                await self.slurm.details.get(*neighbour)
+            except SlurmCommandError:
+                pass  # Shown if the cursor gets there
+
+    def draw(self, detail: JobDetail) -> None:
+        fields_table = Table.grid(padding=(0, 1))
+        fields_table.add_column(style="cyan", no_wrap=True)
+        fields_table.add_column(overflow="fold")
+        for name, value in detail.fields:
+            fields_table.add_row(name, Text(value))  # Not markup
+        age = int(time.monotonic() - detail.fetched_at)
+        title = (
+            f"{_title(detail.job_id, detail.cluster)} [dim]{detail.source}, {age}s ago"
+        )
+        self.query_one(Static).update(Group(title, "", fields_table))
+
+
+def _title(job_id: int, cluster: str) -> str:
+    return f"[b]Job {job_id}[/]" + (f" on {escape(cluster)}" if cluster else "")
@@ -0,0 +1,364 @@
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from ._data import SlurmData, SqueueSnapshot
+from ._jobtable import JobTable
+from ._metrics import PENDING, RUNNING, RUNNING_NODES
+from ._nodes import NodeStatus, SinfoSnapshot
+
+
+class Exporter:
+    """Writes the snapshots of SlurmData sources as they are published.
+
+    With ``diff``, only the jobs and nodes added, changed or removed since
+    the previous snapshot are written, the first snapshot adding them all.
+    """
+
+    sources: Tuple[str, ...] = ("sinfo", "squeue")  # Sources subscribed to
+
+    def __init__(self, stream: TextIO, diff: bool = False):
+        self.stream = stream
+        self.diff = diff
+        # Last nodes written, by cluster and name
+        self._nodes: Dict[Tuple[str, str], NodeStatus] = {}
+        self._table: Optional[JobTable] = None  # Last jobs written
+
+    async def start(self) -> None:
+        """Acquire what the exporter needs inside the running loop."""
+
+    def export(self, source: str, snapshot) -> None:
+        if source == "sinfo":
+            self.export_sinfo(snapshot)
+        else:
+            self.export_squeue(snapshot)
+        self.stream.flush()
+
+    def export_sinfo(self, snapshot: SinfoSnapshot) -> None:
+        pass
+
+    def export_squeue(self, snapshot: SqueueSnapshot) -> None:
+        pass
+
+    def job_events(self, snapshot: SqueueSnapshot) -> Iterator[Tuple[str, Dict]]:
+        """(event, job) pairs of a snapshot, produced one job at a time."""
+        table = snapshot.table
+        if not self.diff:
+            for row in range(len(table)):
+                yield "snapshot", table.record(row)
+            return
+        previous, self._table = self._table, table
+        rows = table.rows
+        for event, job_keys in (
+            ("added", snapshot.diff.added),
+            ("changed", snapshot.diff.changed),
+        ):
+            for job_key in job_keys:
+                yield event, table.record(rows[job_key])
+        for job_key in snapshot.diff.removed:
+            # Removed jobs are described as last written
+            row = previous.rows.get(job_key) if previous is not None else None
+            if row is None:
+                yield "removed", {"job_id": job_key}
+            else:
+                yield "removed", previous.record(row)
+
+    def node_events(self, snapshot: SinfoSnapshot) -> Iterator[Tuple[str, Dict]]:
+        """(event, node) pairs of a snapshot, like ``job_events``."""
+        if not self.diff:
+            for node in snapshot.nodes:
+                yield "snapshot", node._asdict()
+            return
+        nodes = {(node.cluster, node.name): node for node in snapshot.nodes}
+        for key, node in nodes.items():
+            previous = self._nodes.get(key)
+            if previous is None:
+                yield "added", node._asdict()
+            elif previous != node:
+                yield "changed", node._asdict()
+        for key in self._nodes.keys() - nodes.keys():
+            yield "removed", self._nodes[key]._asdict()
+        self._nodes = nodes
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class JsonLinesExporter(Exporter):
+    """One JSON object per partition, node and job, e.g.
+    ``{"t": 1700000000, "type": "job", "event": "added", "job_id": 42, ...}``.
+    """
+
+    def write(self, t: int, kind: str, event: str, fields: Dict) -> None:
+        record = {"t": t, "type": kind, "event": event}
+        record.update(fields)
+        self.stream.write(json.dumps(record) + "\n")
+
+    def export_sinfo(self, snapshot: SinfoSnapshot) -> None:
+        t = int(time.time())
+        for partition in snapshot.partitions:
+            fields = partition._asdict()
+            fields["load"] = partition.load
+            self.write(t, "partition", "snapshot", fields)
+        for event, node in self.node_events(snapshot):
+            self.write(t, "node", event, node)
+
+    def export_squeue(self, snapshot: SqueueSnapshot) -> None:
+        t = snapshot.table.fetched_at
+        for event, job in self.job_events(snapshot):
+            self.write(t, "job", event, job)
+
+
+class CsvExporter(Exporter):
+    """One CSV row per job, under a single header line."""
+
+    sources = ("squeue",)
+
+    def __init__(self, stream: TextIO, diff: bool = False):
+        super().__init__(stream, diff)
+        self.writer = csv.writer(stream)
+        self.writer.writerow(("t", "event") + JobTable.columns)
+
+    def export_squeue(self, snapshot: SqueueSnapshot) -> None:
+        t = snapshot.table.fetched_at
+        for event, job in self.job_events(snapshot):
+            self.writer.writerow(
+                [t, event] + [job.get(column, "") for column in JobTable.columns]
+            )
+
+
+class PrometheusExporter(Exporter):
+    """Partition and queue metrics in the Prometheus text format.
+
+    The metrics are rendered once per refresh, then either written to
+    ``path`` (for the node exporter textfile collector), served on
+    ``listen`` (``(host, port)``) at any scrape rate without any extra Slurm
+    call, or written to ``stream`` once every source was refreshed.
+    """
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(
+        self,
+        stream: TextIO = None,
+        path: str = None,
+        listen: Tuple[str, int] = None,
+    ):
+        super().__init__(stream)
+        self.path = path
+        self.listen = listen
+        self.text = ""
+        self._sinfo: Optional[SinfoSnapshot] = None
+        self._squeue: Optional[SqueueSnapshot] = None
+        self._updated: Dict[str, float] = {}  # source -> last refresh
+        self._unwritten = set(self.sources)  # Sources not refreshed since written
+        self._server = None
+
+    async def start(self) -> None:
+        if self.listen is not None:
+            host, port = self.listen
+            self._server = await asyncio.start_server(self.handle, host, port)
+
+    def export(self, source: str, snapshot) -> None:
+        if source == "sinfo":
+            self._sinfo = snapshot
+        else:
+            self._squeue = snapshot
+        self._updated[source] = time.time()
+        self._unwritten.discard(source)
+        self.text = "".join(line + "\n" for line in self.render())
+        if self.path is not None:
+            try:
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(self.text)
+                os.replace(tmp_path, self.path)  # Never read half-written
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+        elif self.listen is None and not self._unwritten:
+            self.stream.write(self.text)
+            self.stream.flush()
+            self._unwritten = set(self.sources)
+
+    def render(self) -> Iterator[str]:
+        """Lines of the text exposition of the latest snapshots."""
+        if self._sinfo is not None:
+            partitions = self._sinfo.partitions
+            yield from _family(
+                "slurmtop_partition_nodes",
+                "Nodes of a partition, by state.",
+                (
+                    ({**_partition(p.label), "state": state}, value)
+                    for p in partitions
+                    for state, value in (
+                        ("alloc", p.alloc),
+                        ("idle", p.idle),
+                        ("other", p.other),
+                    )
+                ),
+            )
+            yield from _family(
+                "slurmtop_partition_cpus",
+                "CPUs of a partition, by state.",
+                (
+                    ({**_partition(p.label), "state": state}, value)
+                    for p in partitions
+                    if p.cpus_total
+                    for state, value in (
+                        ("alloc", p.cpus_alloc),
+                        ("idle", p.cpus_idle),
+                        ("other", p.cpus_other),
+                    )
+                ),
+            )
+            for field, help_text in (
+                ("gpus_alloc", "GPUs allocated in a partition."),
+                ("gpus_total", "GPUs of a partition."),
+            ):
+                yield from _family(
+                    f"slurmtop_partition_{field}",
+                    help_text,
+                    (
+                        (_partition(p.label), getattr(p, field))
+                        for p in partitions
+                        if p.gpus_total
+                    ),
+                )
+            yield from _family(
+                "slurmtop_partition_load_percent",
+                "Percent of the CPUs (or nodes) of a partition in use.",
+                ((_partition(p.label), p.load) for p in partitions),
+            )
+        if self._squeue is not None:
+            metrics = self._squeue.metrics
+            yield from _family(
+                "slurmtop_jobs",
+                "Jobs in the queue, by state.",
+                (({"state": state}, count) for state, count in metrics.states.items()),
+            )
+            for label, counters, labels in (
+                ("partition", metrics.partitions, _partition),
+                ("user", metrics.users, lambda user: {"user": user}),
+            ):
+                yield from _family(
+                    f"slurmtop_{label}_jobs",
+                    f"Running and pending jobs, by {label}.",
+                    (
+                        ({**labels(key), "state": state}, counts[field])
+                        for key, counts in counters.items()
+                        for state, field in (("running", RUNNING), ("pending", PENDING))
+                    ),
+                )
+                yield from _family(
+                    f"slurmtop_{label}_running_nodes",
+                    f"Nodes used by running jobs, by {label}.",
+                    (
+                        (labels(key), counts[RUNNING_NODES])
+                        for key, counts in counters.items()
+                    ),
+                )
+            yield from _family(
+                "slurmtop_pending_jobs",
+                "Pending jobs, by reason.",
+                (
+                    ({"reason": reason}, count)
+                    for reason, count in metrics.pending_reasons.items()
+                ),
+            )
+        yield from _family(
+            "slurmtop_last_update_timestamp_seconds",
+            "When each source was last refreshed.",
+            (({"source": source}, t) for source, t in self._updated.items()),
+        )
+
+    async def handle(self, reader, writer) -> None:
+        """Answer one HTTP request with the last rendered metrics."""
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            # Request line: method, target and version
+            target = (request.split(b"\r\n", 1)[0].split(b" ") + [b""])[1]
+            if target.split(b"?")[0] in (b"/", b"/metrics"):
+                status, body = "200 OK", self.text.encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {self.content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+        ):
+            pass  # The client went away or did not speak HTTP
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+
+def _family(name: str, help_text: str, samples) -> Iterator[str]:
+    """Text exposition of a gauge, nothing when it has no samples."""
+    lines = []
+    for labels, value in samples:
+        label_text = ",".join(
+            f'{key}="{_escape(str(label))}"' for key, label in labels.items()
+        )
+        lines.append(f"{name}{{{label_text}}} {value}")
+    if lines:
+        yield f"# HELP {name} {help_text}"
+        yield f"# TYPE {name} gauge"
+        yield from lines
+
+
+def _partition(label: str) -> Dict[str, str]:
+    """Labels of a partition, from its ``PartitionStatus.label``."""
+    cluster, _, name = label.rpartition("/")
+    labels = {"cluster": cluster} if cluster else {}
+    labels["partition"] = name.rstrip("*")  # Default partition mark
+    return labels
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def run_headless(slurm: SlurmData, exporter: Exporter, once: bool = False):
+    """Export every live snapshot of the sources of ``exporter``.
+
+    Runs until cancelled or, with ``once``, until each source was exported.
+    """
+    done = asyncio.get_event_loop().create_future()
+    pending: List[str] = list(exporter.sources)
+
+    def subscriber(source: str):
+        def export(snapshot) -> None:
+            if slurm.is_stale(source):
+                return  # From a previous session, not the cluster state
+            exporter.export(source, snapshot)
+            if source in pending:
+                pending.remove(source)
+                if once and not pending and not done.done():
+                    done.set_result(None)
+
+        return export
+
+    await exporter.start()
+    for source in exporter.sources:
+        slurm.subscribe(source, subscriber(source))
+    poller = asyncio.ensure_future(slurm.run())
+    try:
+        await asyncio.wait({poller, done}, return_when=asyncio.FIRST_COMPLETED)
+        if poller.done():
+            poller.result()  # Raise the poller error
+    finally:
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        exporter.close()
@@ -0,0 +1,128 @@
+import getpass
+import json
+import os
+import platform
+import time
+from typing import Dict, NamedTuple
+
+from ._runner import CommandRunner, SlurmCommandError
+
+
+def default_cache_dir() -> str:
+    """Per-user cache directory, following the XDG convention."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "slurmtop")
+
+
+def get_os_release_info():
+    """Retrieve OS release info from /etc/os-release on Linux systems."""
+    os_info = {}
+    try:
+        # Read /etc/os-release for Linux systems
+        with open("/etc/os-release", "r") as f:
+
+            for line in f:
+                # Skip empty lines
+                if not line.strip():
+                    continue
+                # Only process lines that contain an '='
+                if "=" in line:
+                    key, value = line.rstrip().split("=", 1)
+                    os_info[key] = value.strip('"')
+    except FileNotFoundError:
+        os_info["NAME"] = "Unknown Linux"
+        os_info["VERSION_ID"] = "Unknown Version"
+
+    return os_info
+
+
+def get_system_string() -> str:
+    """Human readable OS name and version, e.g. ``Rocky Linux 8.9``."""
+    system = platform.system()
+    if system == "Linux":
+        # Fetch OS release info on Linux systems
+        ri = get_os_release_info()
+        system_list = [ri.get("NAME", "Unknown Linux")]
+        if "VERSION_ID" in ri:
+            system_list.append(ri["VERSION_ID"])
+        return " ".join(system_list)
+    # Fallback for non-Linux systems
+    return f"{system} {platform.release()}"
+
+
+class ClusterFacts(NamedTuple):
+    """Facts that cannot change while slurmtop is running."""
+
+    user: str
+    node: str
+    system: str
+    slurm_version: str
+
+
+class FactsCache:
+    """Session-level cache of the static cluster facts.
+
+    Facts are collected once per session. When ``cache_dir`` is set they are
+    also persisted there, per node, and reused by later sessions for ``ttl``
+    seconds so that startup does not need to run ``sinfo -V``.
+    """
+
+    def __init__(
+        self, runner: CommandRunner, cache_dir: str = None, ttl: float = 86400.0
+    ):
+        self.runner = runner
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.facts = None
+
+    @property
+    def path(self) -> str:
+        # Home directories are usually shared between login nodes
+        return os.path.join(self.cache_dir, f"facts-{platform.node()}.json")
+
+    async def get(self) -> ClusterFacts:
+        """Return the facts, collecting them on first use."""
+        if self.facts is None:
+            facts = self.load()
+            if facts is None:
+                facts = await self.collect()
+                if facts.slurm_version is not None:
+                    self.save(facts)
+            self.facts = facts
+        return self.facts
+
+    async def collect(self) -> ClusterFacts:
+        try:
+            output = await self.runner.run(["sinfo", "-V"], timeout=5.0)
+            slurm_version = output.split()[1]
+        except (SlurmCommandError, IndexError) as e:
+            print(f"Error fetching data: {e}")
+            slurm_version = None
+        return ClusterFacts(
+            getpass.getuser(), platform.node(), get_system_string(), slurm_version
+        )
+
+    def load(self) -> ClusterFacts:
+        """Load persisted facts, or None when missing, invalid or expired."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                cached: Dict = json.load(f)
+            if time.time() - cached["timestamp"] > self.ttl:
+                return None
+            return ClusterFacts(**cached["facts"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, facts: ClusterFacts) -> None:
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"timestamp": time.time(), "facts": facts._asdict()}, f)
+            os.replace(tmp_path, self.path)  # Atomic, concurrent sessions are safe
+        except OSError as e:
+            print(f"Error caching facts: {e}")
@@ -0,0 +1,201 @@
+import json
+import os
+import time
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+Point = Tuple[float, float]  # (epoch seconds, value)
+
+
+class RingBuffer:
+    """Fixed-capacity time series, the oldest points being overwritten."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.values = array("d", [0.0]) * capacity
+        self.start = 0  # Index of the oldest point
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def oldest(self) -> float:
+        return self.times[self.start] if self.size else float("inf")
+
+    def append(self, t: float, value: float) -> None:
+        end = (self.start + self.size) % self.capacity
+        self.times[end] = t
+        self.values[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def points(self, since: float = float("-inf")) -> Iterator[Point]:
+        """Points from ``since`` on, oldest first."""
+        for offset in range(self.size):
+            index = (self.start + offset) % self.capacity
+            if self.times[index] >= since:
+                yield self.times[index], self.values[index]
+
+
+class MetricHistory:
+    """Bounded history of numeric metrics, e.g. ``sinfo/cpu_p1/alloc``.
+
+    Every metric has one RingBuffer per tier: recent samples are kept as they
+    are, older ones as averages over ``resolution`` seconds, so memory does not
+    grow with the uptime. With a ``path``, the points of the last tier are also
+    appended to a JSON lines file, and reloaded by the next session.
+    """
+
+    # (resolution in seconds, points kept), a resolution of 0 keeps raw samples
+    tiers = ((0, 720), (60, 1440))
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.series: Dict[str, List[RingBuffer]] = {}
+        # Downsampling buckets being filled, per tier: metric -> [sum, count]
+        self._buckets: List[Dict[str, List[float]]] = [{} for _ in self.tiers]
+        self._bucket_ids = [None] * len(self.tiers)
+        if path is not None:
+            self.load()
+
+    @property
+    def retention(self) -> float:
+        """Seconds covered by the last tier, and kept on disk."""
+        resolution, capacity = self.tiers[-1]
+        return resolution * capacity
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return [key for key in self.series if key.startswith(prefix)]
+
+    def _rings(self, key: str) -> List[RingBuffer]:
+        rings = self.series.get(key)
+        if rings is None:
+            rings = self.series[key] = [RingBuffer(c) for _, c in self.tiers]
+        return rings
+
+    def record(self, values: Dict[str, float], t: float = None) -> None:
+        """Add a sample of several metrics, taken at ``t`` (now by default)."""
+        t = time.time() if t is None else t
+        for level, (resolution, _) in enumerate(self.tiers):
+            if resolution == 0:
+                for key, value in values.items():
+                    self._rings(key)[level].append(t, value)
+                continue
+            bucket_id = int(t // resolution)
+            if bucket_id != self._bucket_ids[level]:
+                self._flush(level)
+                self._bucket_ids[level] = bucket_id
+            bucket = self._buckets[level]
+            for key, value in values.items():
+                total = bucket.get(key)
+                if total is None:
+                    bucket[key] = [value, 1]
+                else:
+                    total[0] += value
+                    total[1] += 1
+
+    def _flush(self, level: int) -> None:
+        """Turn the filled bucket of a tier into one point per metric."""
+        bucket = self._buckets[level]
+        if not bucket:
+            return
+        t = self._bucket_ids[level] * self.tiers[level][0]
+        means = {key: total / count for key, (total, count) in bucket.items()}
+        for key, mean in means.items():
+            self._rings(key)[level].append(t, mean)
+        self._buckets[level] = {}
+        if self.path is not None and level == len(self.tiers) - 1:
+            self.append(t, means)
+
+    def points(self, key: str, since: float = float("-inf")) -> List[Point]:
+        """Points of a metric from ``since`` on, at the finest resolution kept."""
+        rings = self.series.get(key)
+        if rings is None:
+            return []
+        parts = []
+        until = float("inf")  # Start of the finer tiers already collected
+        for ring in rings:
+            parts.append([point for point in ring.points(since) if point[0] < until])
+            until = min(until, ring.oldest)
+        return [point for part in reversed(parts) for point in part]
+
+    def sparkline(
+        self, key: str, span: float = 3600.0, width: int = 20, maximum: float = None
+    ) -> str:
+        """Sparkline of the last ``span`` seconds of a metric, blank if no data."""
+        now = time.time()
+        return sparkline(self.points(key, now - span), now - span, now, width, maximum)
+
+    def load(self) -> None:
+        """Reload the persisted points, compacting the file when it is stale."""
+        since = time.time() - self.retention
+        try:
+            with open(self.path, "r") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading history: {e}")
+            return
+        # Concurrent sessions may have appended the same or unordered points
+        samples = {line["t"]: line["values"] for line in lines if line["t"] >= since}
+        level = len(self.tiers) - 1
+        for t in sorted(samples):
+            for key, value in samples[t].items():
+                self._rings(key)[level].append(t, value)
+        if len(samples) * 2 < len(lines):
+            self._rewrite(samples)
+
+    def append(self, t: float, values: Dict[str, float]) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"t": t, "values": values}) + "\n")
+        except OSError as e:
+            print(f"Error saving history: {e}")
+
+    def _rewrite(self, samples: Dict[float, Dict[str, float]]) -> None:
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                for t in sorted(samples):
+                    f.write(json.dumps({"t": t, "values": samples[t]}) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error compacting history: {e}")
+
+
+def sparkline(
+    points: List[Point], start: float, end: float, width: int, maximum: float = None
+) -> str:
+    """Render ``points`` between ``start`` and ``end`` as ``width`` block chars.
+
+    Each char is the mean of the points in its time slot, scaled to
+    ``maximum`` (the largest mean by default); slots without points are blank.
+    """
+    totals = [0.0] * width
+    counts = [0] * width
+    step = (end - start) / width
+    for t, value in points:
+        slot = min(width - 1, int((t - start) / step))
+        if slot >= 0:
+            totals[slot] += value
+            counts[slot] += 1
+    means = [total / count if count else None for total, count in zip(totals, counts)]
+    if maximum is None:
+        maximum = max((mean for mean in means if mean is not None), default=0)
+    top = len(SPARK_CHARS) - 1
+    chars = []
+    for mean in means:
+        if mean is None:
+            chars.append(" ")
+        else:
+            level = round(mean / maximum * top) if maximum > 0 else 0
+            chars.append(SPARK_CHARS[max(0, min(top, level))])
+    return "".join(chars)
@@ -0,0 +1,240 @@
+import re
+from itertools import product
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from ._jobtable import JobTable
+
+# Node names of several clusters are told apart by their cluster
+NodeKey = Tuple[str, str]  # (cluster, node name)
+
+# A bracketed range list of a hostlist, e.g. "[0-7,9]"
+_BRACKETS = re.compile(r"\[([^\]]*)\]")
+# Last number of a node name, the one ranges are compressed on
+_LAST_NUMBER = re.compile(r"^(.*?)(\d+)(\D*)$")
+
+
+def split_hostlist(hostlist: str) -> List[str]:
+    """Top-level items of a hostlist, split on the commas outside brackets."""
+    items = []
+    depth = 0
+    start = 0
+    for position, char in enumerate(hostlist):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "," and not depth:
+            items.append(hostlist[start:position])
+            start = position + 1
+    items.append(hostlist[start:])
+    return [item.strip() for item in items if item.strip()]
+
+
+def _range_values(ranges: str) -> List[str]:
+    """Numbers of a bracketed range list, zero padded as written."""
+    values = []
+    for part in ranges.split(","):
+        low, dash, high = part.strip().partition("-")
+        if not dash:
+            values.append(low)
+            continue
+        width = len(low) if low.startswith("0") else 0
+        values.extend(str(n).zfill(width) for n in range(int(low), int(high) + 1))
+    return values
+
+
+def expand(hostlist: str) -> List[str]:
+    """Node names of a Slurm hostlist, e.g. ``r1i[0-1]n[0-1],gpu01``.
+
+    Every bracket of an item is expanded, the first one varying slowest, as
+    ``scontrol show hostnames`` does. ``(null)`` and "" are empty lists.
+    """
+    if hostlist in ("", "(null)", "None assigned"):
+        return []
+    names = []
+    for item in split_hostlist(hostlist):
+        texts = _BRACKETS.split(item)
+        if len(texts) == 1:
+            names.append(item)
+            continue
+        # Literal texts are at even positions, range lists at odd ones
+        choices = [
+            _range_values(text) if index % 2 else (text,)
+            for index, text in enumerate(texts)
+        ]
+        names.extend("".join(parts) for parts in product(*choices))
+    return names
+
+
+def compress(names: Iterable[str]) -> str:
+    """Shortest hostlist of ``names`` on their last number, the inverse of
+    ``expand`` for one-dimensional ranges, e.g. ``n[1-3,7],login``."""
+    # (prefix, suffix) -> numbers as written, in order of first appearance
+    numbered: Dict[Tuple[str, str], List[str]] = {}
+    for name in names:
+        match = _LAST_NUMBER.match(name)
+        if match is None:
+            numbered.setdefault((name, None), [])
+        else:
+            prefix, digits, suffix = match.groups()
+            numbered.setdefault((prefix, suffix), []).append(digits)
+    # Zero padded numbers, e.g. gpu[08-11], are ranged apart from the others
+    groups: Dict[Tuple[str, str, int], List[int]] = {}
+    for (prefix, suffix), numbers in numbered.items():
+        if suffix is None:
+            groups[prefix, "", -1] = []
+            continue
+        padded = [len(d) for d in numbers if len(d) > 1 and d.startswith("0")]
+        width = max(padded, default=0)
+        for digits in numbers:
+            key = (prefix, suffix, width if len(digits) == width else 0)
+            groups.setdefault(key, []).append(int(digits))
+    items = []
+    for (prefix, suffix, width), numbers in groups.items():
+        if width < 0:
+            items.append(prefix)
+            continue
+        numbers = sorted(set(numbers))
+        ranges = []
+        start = previous = numbers[0]
+        for number in numbers[1:] + [None]:
+            if number is not None and number == previous + 1:
+                previous = number
+                continue
+            low, high = str(start).zfill(width), str(previous).zfill(width)
+            ranges.append(low if start == previous else f"{low}-{high}")
+            if number is not None:
+                start = previous = number
+        if len(ranges) == 1 and "-" not in ranges[0]:
+            items.append(f"{prefix}{ranges[0]}{suffix}")
+        else:
+            items.append(f"{prefix}[{','.join(ranges)}]{suffix}")
+    return ",".join(items)
+
+
+def _natural_key(key: NodeKey) -> Tuple:
+    """Sort key of a node, its numbers compared as numbers: n2 before n10."""
+    cluster, name = key
+    return (cluster, [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", name)])
+
+
+class NodeIndex:
+    """Position of every node of the clusters, and node sets as bitsets.
+
+    Nodes are numbered in natural order, so that racks and chassis are laid
+    out together. A set of nodes is an int whose bit ``position`` is set for
+    each of its nodes, so that unions and tests take no Python loop. The
+    bitset of a hostlist is computed once and cached, a running job keeping
+    the same hostlist from one refresh to the next.
+    """
+
+    def __init__(self, nodes: Iterable[NodeKey]):
+        self.nodes: List[NodeKey] = sorted(set(nodes), key=_natural_key)
+        self.positions: Dict[NodeKey, int] = {
+            node: position for position, node in enumerate(self.nodes)
+        }
+        # (cluster, hostlist) -> bitset and positions of its nodes
+        self._sets: Dict[NodeKey, Tuple[int, Tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def node_set(self, hostlist: str, cluster: str = "") -> Tuple[int, Tuple]:
+        """Bitset and positions of the nodes of a hostlist, computed once.
+
+        Nodes unknown to the index are ignored.
+        """
+        key = (cluster, hostlist)
+        node_set = self._sets.get(key)
+        if node_set is None:
+            positions = self.positions
+            found = (positions.get((cluster, name)) for name in expand(hostlist))
+            node_positions = tuple(sorted(p for p in found if p is not None))
+            # Set in a byte array, then converted at once: no big int per node
+            flags = bytearray((len(self.nodes) + 7) // 8)
+            for position in node_positions:
+                flags[position >> 3] |= 1 << (position & 7)
+            bits = int.from_bytes(flags, "little")
+            node_set = self._sets[key] = (bits, node_positions)
+        return node_set
+
+    def bitset(self, hostlist: str, cluster: str = "") -> int:
+        """Nodes of a hostlist, as a bitset."""
+        return self.node_set(hostlist, cluster)[0]
+
+    @staticmethod
+    def iter_positions(bits: int) -> Iterator[int]:
+        """Positions of the nodes of a bitset, in order."""
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def hostlist(self, bits: int) -> str:
+        """Compressed hostlist of a bitset, prefixed by cluster if any."""
+        names: Dict[str, List[str]] = {}
+        for position in self.iter_positions(bits):
+            cluster, name = self.nodes[position]
+            names.setdefault(cluster, []).append(name)
+        return ",".join(
+            f"{cluster}:{compress(cluster_names)}"
+            if cluster
+            else compress(cluster_names)
+            for cluster, cluster_names in names.items()
+        )
+
+    def allocation(self, table: JobTable) -> "NodeAllocation":
+        """Jobs of a table on the nodes of the index.
+
+        Only the node sets of the hostlists of ``table`` are kept in the
+        cache, so that it does not grow with the jobs that ended.
+        """
+        cached, self._sets = self._sets, {}
+        job_bits = []
+        rows: Dict[int, List[int]] = {}
+        for row, (nodes, cluster) in enumerate(zip(table.nodes, table.cluster)):
+            key = (cluster, nodes)
+            node_set = cached.get(key)
+            if node_set is None:
+                node_set = self.node_set(nodes, cluster)
+            else:
+                self._sets[key] = node_set
+            bits, positions = node_set
+            job_bits.append(bits)
+            for position in positions:
+                node_rows = rows.get(position)
+                if node_rows is None:
+                    rows[position] = [row]
+                else:
+                    node_rows.append(row)
+        node_rows = [()] * len(self.nodes)
+        for position, position_rows in rows.items():
+            node_rows[position] = tuple(position_rows)
+        return NodeAllocation(self, table, job_bits, node_rows)
+
+
+class NodeAllocation:
+    """Rows of the jobs on every node, for O(1) lookups by node position."""
+
+    def __init__(
+        self,
+        index: NodeIndex,
+        table: JobTable,
+        job_bits: Sequence[int],
+        node_rows: Sequence[Tuple[int, ...]],
+    ):
+        self.index = index
+        self.table = table
+        self.job_bits = job_bits  # Nodes of every row, as a bitset
+        self.node_rows = node_rows  # Rows of the jobs on every node position
+
+    def rows_on(self, position: int) -> Tuple[int, ...]:
+        """Rows of the jobs on a node, by position."""
+        return self.node_rows[position]
+
+    def user_bits(self, user_name: str) -> int:
+        """Nodes of every job of a user, as one bitset."""
+        bits = 0
+        for row in self.table.index("user_name").get(user_name, ()):
+            bits |= self.job_bits[row]
+        return bits
@@ -1,39 +1,12 @@
-import getpass
-import os
-import platform
-import subprocess
-import time
-from asyncio import sleep
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from rich.table import Table
 from textual import work
 from textual.app import ComposeResult
-from textual.geometry import Size
+from textual.containers import Horizontal
 from textual.widget import Widget
 from textual.widgets import Label
 
-
-def get_os_release_info():
-    """Retrieve OS release info from /etc/os-release on Linux systems."""
-    os_info = {}
-    try:
-        # Read /etc/os-release for Linux systems
-        with open("/etc/os-release", "r") as f:
-
-            for line in f:
-                # Skip empty lines
-                if not line.strip():
-                    continue
-                # Only process lines that contain an '='
-                if "=" in line:
-                    key, value = line.rstrip().split("=", 1)
-                    os_info[key] = value.strip('"')
-    except FileNotFoundError:
-        os_info["NAME"] = "Unknown Linux"
-        os_info["VERSION_ID"] = "Unknown Version"
-
-    return os_info
+from ._data import SlurmData
 
 
 class InfoLine(Widget):
@@ -42,64 +15,50 @@ class InfoLine(Widget):
         height: 1fr;
         border: round #33ffbe;
         }
-    
+    InfoLine Horizontal {
+        height: auto;
+        }
+    InfoLine #facts {
+        width: 1fr;
+        }
+    InfoLine #clock {
+        width: auto;
+        }
     """
     BORDER_TITLE = "SLURMTOP"
 
-    def __init__(self):
+    def __init__(self, slurm: SlurmData):
         super().__init__()
+        self.slurm = slurm
+        self.left_string = ""
         self.loading = True
 
     def compose(self) -> ComposeResult:
-        yield Label()
+        yield Horizontal(Label(id="facts"), Label(id="clock"))
 
     def on_mount(self) -> None:
         """Start loading data when the widget is mounted."""
-        self.set_interval(1.0, self.refresh_viewer)
-        self.refresh_viewer()  # Trigger the async data loading task
-
-    @work  # Make sure this runs asynchronously
-    async def refresh_viewer(self) -> None:
-        """Simulate loading data asynchronously."""
-        # await sleep(1)  # Simulate data fetching or processing delay
+        self.app.frames.add_ticker(self.refresh_clock)
+        self.refresh_clock()
+        self.load_facts()  # Trigger the async data loading task
 
-        line = self.query_one(Label)
+    def on_unmount(self) -> None:
+        self.app.frames.remove_ticker(self.refresh_clock)
 
-        username = getpass.getuser()
-        ustring = f"{username}@"
-
-        # Get machine node
-        node = platform.node()
-        if node:
-            ustring += f"[b]{node}[/]"
-
-        # Determine system
-        system = platform.system()
-        if system == "Linux":
-            # Fetch OS release info on Linux systems
-            ri = get_os_release_info()
-            system_list = [ri.get("NAME", "Unknown Linux")]
-            if "VERSION_ID" in ri:
-                system_list.append(ri["VERSION_ID"])
-            # Optionally, you can add architecture or platform release info
-            # system_list.append(f"{platform.architecture()[0]}/ {platform.release()}")
-            system_string = " ".join(system_list)
-        else:
-            # Fallback for non-Linux systems
-            system_string = f"{system} {platform.release()}"
-
-        result = subprocess.run(
-            ["sinfo", "-V"], capture_output=True, text=True, check=True
-        )
-        slurm_string = "/ Slurm " + result.stdout.split()[1]
-        self.left_string = " ".join([ustring, system_string, slurm_string])
-
-        table = Table(show_header=False, box=None, width=os.get_terminal_size()[0] - 2)
-
-        table.add_column(justify="left")
-        table.add_column(justify="right")
-        table.add_row(self.left_string, datetime.now().strftime("%c"))
+    @work  # Make sure this runs asynchronously
+    async def load_facts(self) -> None:
+        """Draw the static facts, which are only fetched once per session."""
+        facts = await self.slurm.facts.get()
 
-        line.update(table)
+        ustring = f"{facts.user}@"
+        if facts.node:
+            ustring += f"[b]{facts.node}[/]"
+        slurm_string = "/ Slurm " + (facts.slurm_version or "unknown")
+        self.left_string = " ".join([ustring, facts.system, slurm_string])
 
+        self.query_one("#facts", Label).update(self.left_string)
         self.loading = False  # Data has been loaded, stop loading indicator
+
+    def refresh_clock(self) -> None:
+        """Redraw the clock, the only part of the line that changes."""
+        self.query_one("#clock", Label).update(datetime.now().strftime("%c"))
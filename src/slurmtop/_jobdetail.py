@@ -0,0 +1,191 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Tuple
+
+from ._runner import CommandRunner, SlurmCommandError, cluster_args
+
+# Start of each `Key=Value` pair of `scontrol show job -o`, values may hold "="
+_SCONTROL_KEY = re.compile(r"(?:^|\s)([A-Za-z][\w:/]*)=")
+
+
+class JobDetail(NamedTuple):
+    """Immutable detail of one job, as fetched for the detail pane."""
+
+    job_id: int
+    cluster: str  # "" for the default cluster
+    source: str  # Command the fields come from, scontrol or sacct
+    fields: Tuple[Tuple[str, str], ...]  # (name, value) pairs, in display order
+    fetched_at: float  # time.monotonic() of the fetch
+
+
+class JobDetailCache:
+    """LRU cache of the job details, fetched lazily one job at a time.
+
+    A job is looked up with ``scontrol show job`` while the controller still
+    knows it, and with ``sacct`` once it has left the queue. Details are kept
+    for ``ttl`` seconds, the least recently used ones being dropped beyond
+    ``max_entries``. Concurrent lookups of a job share a single fetch, whose
+    result is cached even if every caller has given up on it.
+    """
+
+    max_entries = 256  # Jobs kept
+    timeout = 10.0  # Seconds allowed to each lookup
+
+    # Fields of `scontrol show job` shown, in order, when present
+    scontrol_fields = (
+        "JobId",
+        "JobName",
+        "UserId",
+        "Account",
+        "QOS",
+        "Partition",
+        "JobState",
+        "Reason",
+        "Dependency",
+        "Priority",
+        "SubmitTime",
+        "StartTime",
+        "EndTime",
+        "RunTime",
+        "TimeLimit",
+        "NumNodes",
+        "NumCPUs",
+        "NumTasks",
+        "TRES",
+        "NodeList",
+        "BatchHost",
+        "ExitCode",
+        "WorkDir",
+        "Command",
+        "StdOut",
+        "StdErr",
+    )
+    # Fields of `sacct`, for jobs the controller has forgotten
+    sacct_fields = (
+        "JobID",
+        "JobName",
+        "User",
+        "Account",
+        "QOS",
+        "Partition",
+        "State",
+        "Reason",
+        "Priority",
+        "Submit",
+        "Start",
+        "End",
+        "Elapsed",
+        "Timelimit",
+        "NNodes",
+        "NCPUS",
+        "AllocTRES",
+        "NodeList",
+        "ExitCode",
+        "WorkDir",
+    )
+
+    def __init__(self, runner: CommandRunner, ttl: float = 30.0):
+        self.runner = runner
+        self.ttl = ttl  # Seconds a detail is shown without being fetched again
+        # (cluster, job id) -> detail
+        self._entries: "OrderedDict[Tuple[str, int], JobDetail]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}  # In flight
+
+    def cached(self, job_id: int, cluster: str = "") -> JobDetail:
+        """The detail of a job if it is cached and fresh, else None."""
+        key = (cluster, job_id)
+        detail = self._entries.get(key)
+        if detail is None:
+            return None
+        if time.monotonic() - detail.fetched_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return detail
+
+    async def get(self, job_id: int, cluster: str = "") -> JobDetail:
+        """The detail of a job of ``cluster``, fetched unless cached.
+
+        Raises SlurmCommandError when neither scontrol nor sacct know the job.
+        """
+        detail = self.cached(job_id, cluster)
+        if detail is not None:
+            return detail
+        key = (cluster, job_id)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch(job_id, cluster))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._store(key, done))
+        # Shielded so that a cancelled caller does not waste the command
+        return await asyncio.shield(task)
+
+    def _store(self, key: Tuple[str, int], task: asyncio.Future) -> None:
+        del self._pending[key]
+        if task.cancelled() or task.exception() is not None:
+            return  # Not cached, the next lookup tries again
+        self._entries[key] = task.result()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def fetch(self, job_id: int, cluster: str = "") -> JobDetail:
+        clusters = cluster_args(cluster)
+        try:
+            output = await self.runner.run(
+                ["scontrol", "show", "job", "-o", str(job_id)] + clusters,
+                timeout=self.timeout,
+            )
+            fields = self.parse_scontrol(output)
+            return JobDetail(job_id, cluster, "scontrol", fields, time.monotonic())
+        except SlurmCommandError as e:
+            scontrol_error = e
+        try:
+            output = await self.runner.run(
+                ["sacct", "-j", str(job_id), "-X", "-P"]
+                + ["-o", ",".join(self.sacct_fields)]
+                + clusters,
+                timeout=self.timeout,
+            )
+            fields = self.parse_sacct(output)
+        except SlurmCommandError as e:
+            raise SlurmCommandError(f"{scontrol_error}; {e}") from e
+        return JobDetail(job_id, cluster, "sacct", fields, time.monotonic())
+
+    def parse_scontrol(self, output: str) -> Tuple[Tuple[str, str], ...]:
+        """Pick the shown fields of a ``scontrol show job -o`` line.
+
+        Array jobs print one line per task, the first one is kept.
+        """
+        lines = [line for line in output.splitlines() if line.strip()]
+        line = next((line for line in lines if not line.startswith("CLUSTER: ")), "")
+        matches = list(_SCONTROL_KEY.finditer(line))
+        if not matches:
+            raise SlurmCommandError(f"Invalid scontrol output: {line[:80]!r}")
+        values: Dict[str, str] = {}
+        for match, end in zip(matches, matches[1:] + [None]):
+            stop = end.start() if end is not None else len(line)
+            values.setdefault(match.group(1), line[match.end() : stop].strip())
+        return _shown(self.scontrol_fields, values)
+
+    def parse_sacct(self, output: str) -> Tuple[Tuple[str, str], ...]:
+        """Pick the shown fields of ``sacct -P``, a header and a job line."""
+        lines = output.splitlines()
+        if len(lines) < 2:
+            raise SlurmCommandError("No accounting record")
+        return _shown(
+            self.sacct_fields, dict(zip(lines[0].split("|"), lines[1].split("|")))
+        )
+
+
+def _shown(
+    names: Tuple[str, ...], values: Dict[str, str]
+) -> Tuple[Tuple[str, str], ...]:
+    """(name, value) pairs of ``names`` with a meaningful value."""
+    return tuple(
+        (name, values[name])
+        for name in names
+        if values.get(name) not in (None, "", "(null)", "None")
+    )
@@ -0,0 +1,138 @@
+import re
+from typing import List, Sequence, Set, Tuple
+
+from ._data import JOB_STATE_CODES
+from ._jobtable import JobTable
+
+# Field prefixes of the filter bar, and the column they match
+FILTER_FIELDS = {
+    "user": "user_name",
+    "u": "user_name",
+    "partition": "partition",
+    "p": "partition",
+    "state": "job_state",
+    "t": "job_state",
+    "reason": "reason",
+    "cluster": "cluster",
+    "m": "cluster",
+}
+
+
+class JobFilter:
+    """Live filter of a job table, parsed from the filter bar.
+
+    Space separated terms must all match:
+
+    - ``user:alice,bob`` (or ``u:``), ``partition:gpu`` (or ``p:``),
+      ``state:R,PD`` (or ``t:``), ``reason:`` and ``cluster:`` (or ``M:``)
+      accept a job whose column starts with any of the comma separated
+      values, ignoring case.
+    - ``/regex`` searches the job name.
+    - Any other word is a case-insensitive substring of the job name.
+
+    Terms are matched against the keys of the inverted indexes of the table,
+    and the most selective one gives the candidate rows, so that only those
+    are checked further. A filter that ``narrows`` the previous one only has
+    to recheck its result, which is what happens on most keystrokes.
+    """
+
+    def __init__(self, query: str = ""):
+        self.query = query
+        self.terms: List[Tuple[str, Tuple[str, ...]]] = []  # (column, prefixes)
+        self.texts: List[str] = []
+        self.patterns: List[str] = []
+        for word in query.split():
+            field, colon, values = word.partition(":")
+            if colon and field.lower() in FILTER_FIELDS:
+                column = FILTER_FIELDS[field.lower()]
+                prefixes = tuple(
+                    self.fold(column, value) for value in values.split(",") if value
+                )
+                if prefixes:
+                    self.terms.append((column, prefixes))
+            elif word.startswith("/"):
+                if word.strip("/"):
+                    self.patterns.append(word[1:])
+            else:
+                self.texts.append(word.lower())
+        self._regexes = [_compile(pattern) for pattern in self.patterns]
+
+    def __bool__(self) -> bool:
+        return bool(self.terms or self.texts or self.patterns)
+
+    @staticmethod
+    def fold(column: str, value: str) -> str:
+        if column == "job_state":
+            value = JOB_STATE_CODES.get(value.upper(), value)
+        return value.lower()
+
+    def narrows(self, other: "JobFilter") -> bool:
+        """Whether every job accepted by this filter is accepted by ``other``."""
+        for column, prefixes in other.terms:
+            if not any(
+                term_column == column
+                and all(prefix.startswith(prefixes) for prefix in term_prefixes)
+                for term_column, term_prefixes in self.terms
+            ):
+                return False
+        if not all(any(old in new for new in self.texts) for old in other.texts):
+            return False
+        return set(other.patterns) <= set(self.patterns)
+
+    def values(
+        self, table: JobTable, column: str, prefixes: Tuple[str, ...]
+    ) -> Set[str]:
+        """Values of a column matched by a term, from the index keys."""
+        return {
+            value for value in table.index(column) if value.lower().startswith(prefixes)
+        }
+
+    def select(
+        self, table: JobTable, order: Sequence[int], positions: Sequence[int] = None
+    ) -> List[int]:
+        """The rows of ``order`` accepted by the filter, in the same order.
+
+        With ``positions``, the rank of every row of the table in ``order``,
+        the rows of the most selective term are taken from the index and
+        ranked, instead of checking the whole of ``order``.
+        """
+        terms = [
+            (column, self.values(table, column, prefixes))
+            for column, prefixes in self.terms
+        ]
+        rows = order
+        if terms and positions is not None:
+            index = table.index
+            counts = [
+                sum(len(index(column)[value]) for value in values)
+                for column, values in terms
+            ]
+            best = min(range(len(terms)), key=counts.__getitem__)
+            if counts[best] * 4 < len(order):
+                column, values = terms.pop(best)
+                rows = [row for value in values for row in index(column)[value]]
+                rows.sort(key=positions.__getitem__)
+        for column, values in terms:
+            cells = getattr(table, column)
+            rows = [row for row in rows if cells[row] in values]
+        return self._match_names(table, rows)
+
+    def _match_names(self, table: JobTable, rows: Sequence[int]) -> List[int]:
+        if self.texts:
+            folded = table.folded("name")
+            for text in self.texts:
+                rows = [row for row in rows if text in folded[row]]
+        if self._regexes:
+            names = table.name
+            for regex in self._regexes:
+                rows = [row for row in rows if regex.search(names[row])]
+        return list(rows)
+
+
+def _compile(pattern: str) -> "re.Pattern":
+    """Compile a regex being typed, literally until it is valid."""
+    pattern = pattern[:-1] if pattern.endswith("/") else pattern
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return re.compile(re.escape(pattern))
@@ -0,0 +1,280 @@
+import sys
+import time
+from array import array
+from datetime import timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Sort specification: (display key, reverse) pairs, most significant first
+SortSpec = Sequence[Tuple[str, bool]]
+
+UNLIMITED = -1  # Time limit of the jobs without one
+# Job keys of a merged table: cluster index << CLUSTER_SHIFT | job id
+CLUSTER_SHIFT = 40
+
+
+class JobTable:
+    """Columnar store of a job list snapshot.
+
+    Numeric fields are kept as native integers in ``array`` columns, repeated
+    strings (partition, user, state) are interned, and nothing is formatted
+    until a cell is actually displayed. A table is filled once by its producer
+    and must not be modified after it has been published.
+
+    Jobs are identified by ``job_key``, their id, except in a table merging
+    several clusters where job ids may collide.
+    """
+
+    # Display keys, in column order
+    keys = (
+        "job_id",
+        "partition",
+        "name",
+        "user_name",
+        "job_state",
+        "time_elapse",
+        "time_left",
+        "node_number",
+        "nodes",
+        "priority_number",
+    )
+    # Display keys stored under another column name
+    aliases = {"node_number": "node_count", "priority_number": "priority"}
+    # Display keys computed from the clock, they change without any refresh
+    clock_keys = frozenset(("time_elapse", "time_left"))
+    max_width = 20  # Longer display values are truncated with "..."
+
+    def __init__(self, fetched_at: float = None):
+        self.fetched_at = int(fetched_at or time.time())
+        self.job_id = array("q")
+        self.priority = array("q")
+        self.node_count = array("q")
+        self.start_time = array("q")  # Epoch seconds, 0 when unknown
+        self.time_limit = array("q")  # Seconds, 0 when unknown, or UNLIMITED
+        self.partition: List[str] = []
+        self.name: List[str] = []
+        self.user_name: List[str] = []
+        self.job_state: List[str] = []
+        self.nodes: List[str] = []
+        self.reason: List[str] = []  # Why a job is pending, "None" otherwise
+        self.cluster: List[str] = []  # "" for the default cluster
+        self.job_key = self.job_id  # Unique id of every job, see ``merge``
+        self._rows = None  # job_key -> row, built on first use
+        self._sort_keys = {}  # display key -> typed sort key of every row
+        self._indexes = {}  # column -> rows of each of its values
+        self._folded = {}  # column -> lowercase value of every row
+
+    def __len__(self) -> int:
+        return len(self.job_id)
+
+    def append(
+        self,
+        job_id: int,
+        partition: str,
+        name: str,
+        user_name: str,
+        job_state: str,
+        node_count: int,
+        nodes: str,
+        priority: int,
+        start_time: int,
+        reason: str = "None",
+        time_limit: int = 0,
+        cluster: str = "",
+    ) -> None:
+        self.job_id.append(job_id)
+        self.partition.append(sys.intern(partition))
+        self.name.append(name)
+        self.user_name.append(sys.intern(user_name))
+        self.job_state.append(sys.intern(job_state))
+        self.node_count.append(node_count)
+        self.nodes.append(nodes)
+        self.priority.append(priority)
+        self.start_time.append(start_time)
+        self.reason.append(sys.intern(reason))
+        self.time_limit.append(time_limit)
+        self.cluster.append(sys.intern(cluster))
+
+    # Columns stored by to_dict, native integers first
+    int_columns = ("job_id", "priority", "node_count", "start_time", "time_limit")
+    str_columns = (
+        "partition",
+        "name",
+        "user_name",
+        "job_state",
+        "nodes",
+        "reason",
+        "cluster",
+    )
+    # Every stored column, in the order of ``append``
+    columns = (
+        "job_id",
+        "partition",
+        "name",
+        "user_name",
+        "job_state",
+        "node_count",
+        "nodes",
+        "priority",
+        "start_time",
+        "reason",
+        "time_limit",
+        "cluster",
+    )
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable copy of the columns."""
+        columns = {name: getattr(self, name).tolist() for name in self.int_columns}
+        for name in self.str_columns:
+            columns[name] = getattr(self, name)
+        if self.job_key is not self.job_id:
+            columns["job_key"] = self.job_key.tolist()
+        return {"fetched_at": self.fetched_at, "columns": columns}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "JobTable":
+        """Inverse of ``to_dict``, raising KeyError or ValueError if invalid."""
+        table = cls(data["fetched_at"])
+        columns = data["columns"]
+        for name in cls.int_columns:
+            setattr(table, name, array("q", columns[name]))
+        for name in cls.str_columns:
+            setattr(table, name, [sys.intern(value) for value in columns[name]])
+        table.job_key = (
+            array("q", columns["job_key"]) if "job_key" in columns else table.job_id
+        )
+        if len({len(getattr(table, name)) for name in columns}) > 1:
+            raise ValueError("Job table columns of different lengths")
+        return table
+
+    @classmethod
+    def merge(cls, tables: Sequence["JobTable"]) -> "JobTable":
+        """One table of the jobs of several clusters, one table per cluster.
+
+        The key of a job is its id, tagged with the index of its cluster. A
+        single table is returned as is.
+        """
+        if len(tables) == 1:
+            return tables[0]
+        merged = cls.concat(tables)
+        merged.job_key = array("q")
+        for index, table in enumerate(tables):
+            tag = index << CLUSTER_SHIFT
+            merged.job_key.extend(tag | job_id for job_id in table.job_id)
+        return merged
+
+    @classmethod
+    def concat(cls, tables: Sequence["JobTable"]) -> "JobTable":
+        """One table of the rows of several tables of a cluster, in order.
+
+        Their jobs are keyed by id, e.g. the shards of one squeue output.
+        """
+        if len(tables) == 1:
+            return tables[0]
+        concatenated = cls(min((table.fetched_at for table in tables), default=None))
+        for table in tables:
+            for name in cls.columns:
+                getattr(concatenated, name).extend(getattr(table, name))
+        return concatenated
+
+    def record(self, row: int) -> Dict:
+        """Stored values of a row, by column name."""
+        return {name: getattr(self, name)[row] for name in self.columns}
+
+    @property
+    def rows(self) -> Dict[int, int]:
+        """Row index of each job key."""
+        if self._rows is None:
+            self._rows = {key: row for row, key in enumerate(self.job_key)}
+        return self._rows
+
+    def elapsed(self, row: int, now: int = None) -> int:
+        """Seconds elapsed since the job started, -1 if it has not started.
+
+        ``now`` is the epoch time of the clock columns, the fetch time by
+        default.
+        """
+        now = now or self.fetched_at
+        start_time = self.start_time[row]
+        if start_time <= 0 or start_time > now:
+            return -1
+        return now - start_time
+
+    def remaining(self, row: int, now: int = None) -> int:
+        """Seconds left before the time limit, all of it if not started.
+
+        -1 if the limit is unknown, ``sys.maxsize`` if there is none.
+        """
+        time_limit = self.time_limit[row]
+        if time_limit == UNLIMITED:
+            return sys.maxsize
+        if time_limit <= 0:
+            return -1
+        return max(0, time_limit - max(0, self.elapsed(row, now)))
+
+    def value(self, row: int, key: str, now: int = None):
+        """Typed value of a display column."""
+        if key == "time_elapse":
+            return self.elapsed(row, now)
+        if key == "time_left":
+            return self.remaining(row, now)
+        return getattr(self, self.aliases.get(key, key))[row]
+
+    def format_cell(self, row: int, key: str, now: int = None) -> str:
+        """Display string of a cell, formatted on demand."""
+        if key in self.clock_keys:
+            seconds = self.value(row, key, now)
+            if seconds == sys.maxsize:
+                text = "UNLIMITED"
+            else:
+                text = str(timedelta(seconds=seconds)) if seconds >= 0 else ""
+        else:
+            text = str(self.value(row, key))
+        if len(text) > self.max_width:
+            return text[: self.max_width - 3] + "..."
+        return text
+
+    def format_row(
+        self, row: int, keys: Iterable[str] = None, now: int = None
+    ) -> List[str]:
+        return [self.format_cell(row, key, now) for key in keys or self.keys]
+
+    def sort_key(self, key: str) -> Sequence:
+        """Typed sort key of every row for a display column, computed once."""
+        sort_key = self._sort_keys.get(key)
+        if sort_key is None:
+            if key in self.clock_keys:
+                # Ordered as of the fetch, every running job ages alike
+                values = (self.value(row, key) for row in range(len(self)))
+                sort_key = array("q", values)
+            else:
+                sort_key = getattr(self, self.aliases.get(key, key))
+            self._sort_keys[key] = sort_key
+        return sort_key
+
+    def index(self, column: str) -> Dict[str, Sequence[int]]:
+        """Rows of each value of a string column, in order, built once."""
+        index = self._indexes.get(column)
+        if index is None:
+            index = {}
+            for row, value in enumerate(getattr(self, column)):
+                rows = index.get(value)
+                if rows is None:
+                    rows = index[value] = array("q")
+                rows.append(row)
+            self._indexes[column] = index
+        return index
+
+    def folded(self, column: str) -> List[str]:
+        """Lowercase value of every row of a string column, computed once."""
+        folded = self._folded.get(column)
+        if folded is None:
+            folded = self._folded[column] = [v.lower() for v in getattr(self, column)]
+        return folded
+
+    def sorted_rows(self, spec: SortSpec) -> List[int]:
+        """Row indices ordered by ``spec``, a stable multi-column sort."""
+        rows = list(range(len(self)))
+        # Stable sorts from the least to the most significant column
+        for key, reverse in reversed(spec):
+            rows.sort(key=self.sort_key(key).__getitem__, reverse=reverse)
+        return rows
@@ -0,0 +1,280 @@
+import time
+from typing import Dict, List, Sequence
+
+from rich.segment import Segment
+from rich.style import Style
+from textual.binding import Binding
+from textual.events import Click
+from textual.geometry import Size
+from textual.message import Message
+from textual.reactive import reactive
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from ._jobtable import JobTable
+
+
+class JobTableView(ScrollView, can_focus=True):
+    """Virtual-scrolling view of a JobTable.
+
+    The view holds no rows of its own: it reads the published table through
+    ``order``, the row indices to display, and formats only the rows in the
+    viewport plus ``overscan`` rows on either side. The cost of a frame does
+    not depend on the number of jobs.
+
+    The clock columns (elapsed and remaining time) are recomputed from the
+    local clock every second, for the visible rows only, so that they stay
+    live between two refreshes of the job list.
+    """
+
+    DEFAULT_CSS = """
+    JobTableView {
+        height: 1fr;
+    }
+    JobTableView > .job-table--header {
+        text-style: bold;
+    }
+    JobTableView > .job-table--cursor {
+        background: $accent;
+    }
+    """
+    COMPONENT_CLASSES = {"job-table--header", "job-table--cursor"}
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Cursor Up", show=False),
+        Binding("down", "cursor_down", "Cursor Down", show=False),
+        Binding("pageup", "cursor_page_up", "Page Up", show=False),
+        Binding("pagedown", "cursor_page_down", "Page Down", show=False),
+        Binding("home", "cursor_home", "First Job", show=False),
+        Binding("end", "cursor_end", "Last Job", show=False),
+        Binding("enter", "select_cursor", "Details"),
+    ]
+
+    # Display width of each column, with room for the sort indicator
+    column_widths = {
+        "cluster": 12,
+        "job_id": 10,
+        "partition": 12,
+        "name": JobTable.max_width,
+        "user_name": 12,
+        "job_state": 12,
+        "time_elapse": 16,
+        "time_left": 16,
+        "node_number": 13,
+        "nodes": JobTable.max_width,
+        "priority_number": 17,
+    }
+    # Columns aligned to the right
+    numeric_keys = {
+        "job_id",
+        "time_elapse",
+        "time_left",
+        "node_number",
+        "priority_number",
+    }
+    overscan = 20  # Rows formatted beyond each edge of the viewport
+
+    cursor = reactive(0)  # Position of the highlighted row in ``order``
+
+    class HeaderSelected(Message):
+        """Posted when a column header is clicked."""
+
+        def __init__(self, key: str):
+            super().__init__()
+            self.key = key
+
+    class RowHighlighted(Message):
+        """Posted when the cursor moves to another row."""
+
+        def __init__(self, job_key: int):
+            super().__init__()
+            self.job_key = job_key
+
+    class RowSelected(Message):
+        """Posted when the row under the cursor is selected with Enter."""
+
+        def __init__(self, job_key: int):
+            super().__init__()
+            self.job_key = job_key
+
+    def __init__(self, keys: Sequence[str] = JobTable.keys, **kwargs):
+        super().__init__(**kwargs)
+        self.keys = tuple(keys)
+        self.table = JobTable()
+        self.order: Sequence[int] = []  # Row indices of ``table``, top to bottom
+        self.sort_indicators: Dict[str, bool] = {}  # key -> reverse
+        self._cells: Dict[int, List[str]] = {}  # row -> formatted cells
+        self._window = (0, 0)  # Positions covered by ``_cells``
+        self._offsets = []  # x offset of each column
+        offset = 0
+        for key in self.keys:
+            self._offsets.append(offset)
+            offset += self.column_widths.get(key, JobTable.max_width) + 1
+        self._line_width = offset
+        # Positions of the clock columns, whose cells are not kept
+        self._clock_columns = [
+            column for column, key in enumerate(self.keys) if key in JobTable.clock_keys
+        ]
+        self.now = int(time.time())  # Clock of the clock columns
+
+    def on_mount(self) -> None:
+        if self._clock_columns:
+            self.app.frames.add_ticker(self.tick)
+
+    def on_unmount(self) -> None:
+        if self._clock_columns:
+            self.app.frames.remove_ticker(self.tick)
+
+    def tick(self) -> None:
+        """Advance the clock columns, redrawing the visible rows only."""
+        now = int(time.time())
+        if now != self.now:
+            self.now = now
+            if self.order:
+                self.refresh()
+
+    @property
+    def cursor_key(self) -> int:
+        """Key of the job under the cursor, None when the view is empty."""
+        if not self.order:
+            return None
+        return self.table.job_key[self.order[self.cursor]]
+
+    def jobs_around(self, count: int) -> List[int]:
+        """Job keys of up to ``count`` rows on either side of the cursor."""
+        job_keys = []
+        for distance in range(1, count + 1):
+            for position in (self.cursor + distance, self.cursor - distance):
+                if 0 <= position < len(self.order):
+                    job_keys.append(self.table.job_key[self.order[position]])
+        return job_keys
+
+    def show(self, table: JobTable, order: Sequence[int]) -> None:
+        """Display ``table`` in ``order``, keeping the cursor on the same job."""
+        job_key = self.cursor_key
+        self.table = table
+        self.order = order
+        self._cells = {}
+        self._window = (0, 0)
+        self.virtual_size = Size(self._line_width, len(order) + 1)
+        cursor = 0
+        row = table.rows.get(job_key) if job_key is not None else None
+        if row is not None:
+            # Linear, but only once per refresh or sort
+            try:
+                cursor = order.index(row)
+            except ValueError:
+                cursor = min(self.cursor, len(order) - 1)
+        self.set_reactive(JobTableView.cursor, max(0, cursor))
+        self.refresh()
+
+    def _format_window(self) -> None:
+        """Format the rows around the viewport, reusing the cells still in it."""
+        top = int(self.scroll_offset.y)
+        start = max(0, top - self.overscan)
+        stop = min(len(self.order), top + self.size.height + self.overscan)
+        if self._window[0] <= start and stop <= self._window[1]:
+            return
+        cells = {}
+        for row in self.order[start:stop]:
+            cells[row] = self._cells.get(row) or self.table.format_row(row, self.keys)
+        self._cells = cells
+        self._window = (start, stop)
+
+    def _render_cells(self, cells: Sequence[str], style: Style) -> List[Segment]:
+        segments = []
+        for key, text in zip(self.keys, cells):
+            width = self.column_widths.get(key, JobTable.max_width)
+            text = text[:width]
+            if key in self.numeric_keys:
+                text = text.rjust(width)
+            else:
+                text = text.ljust(width)
+            segments.append(Segment(text + " ", style))
+        return segments
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        base_style = self.rich_style
+        if y == 0:
+            labels = []
+            for key in self.keys:
+                if key in self.sort_indicators:
+                    labels.append(key + (" ▼" if self.sort_indicators[key] else " ▲"))
+                else:
+                    labels.append(key)
+            style = base_style + self.get_component_rich_style("job-table--header")
+            segments = self._render_cells(labels, style)
+        else:
+            position = scroll_y + y - 1
+            if position >= len(self.order):
+                return Strip.blank(self.size.width, base_style)
+            self._format_window()
+            style = base_style
+            if position == self.cursor:
+                style += self.get_component_rich_style("job-table--cursor")
+            row = self.order[position]
+            cells = self._cells[row]
+            if self._clock_columns:
+                cells = list(cells)
+                for column in self._clock_columns:
+                    key = self.keys[column]
+                    cells[column] = self.table.format_cell(row, key, self.now)
+            segments = self._render_cells(cells, style)
+        strip = Strip(segments, self._line_width)
+        return strip.crop_extend(scroll_x, scroll_x + self.size.width, base_style)
+
+    def watch_cursor(self, old_cursor: int, cursor: int) -> None:
+        # Row lines are one below their position, under the header
+        self.refresh_line(old_cursor + 1)
+        self.refresh_line(cursor + 1)
+        # Keep the cursor inside the viewport
+        top = int(self.scroll_offset.y)
+        visible = max(1, self.size.height - 1)
+        if cursor < top:
+            self.scroll_to(y=cursor, animate=False)
+        elif cursor >= top + visible:
+            self.scroll_to(y=cursor - visible + 1, animate=False)
+        if self.order:
+            self.post_message(self.RowHighlighted(self.cursor_key))
+
+    def on_click(self, event: Click) -> None:
+        offset = event.get_content_offset(self)
+        if offset is None:
+            return
+        if offset.y == 0:
+            x = offset.x + int(self.scroll_offset.x)
+            for key, start in zip(reversed(self.keys), reversed(self._offsets)):
+                if x >= start:
+                    self.post_message(self.HeaderSelected(key))
+                    break
+        else:
+            position = int(self.scroll_offset.y) + offset.y - 1
+            if position < len(self.order):
+                self.cursor = position
+
+    def _move_cursor(self, position: int) -> None:
+        if self.order:
+            self.cursor = max(0, min(len(self.order) - 1, position))
+
+    def action_select_cursor(self) -> None:
+        if self.order:
+            self.post_message(self.RowSelected(self.cursor_key))
+
+    def action_cursor_up(self) -> None:
+        self._move_cursor(self.cursor - 1)
+
+    def action_cursor_down(self) -> None:
+        self._move_cursor(self.cursor + 1)
+
+    def action_cursor_page_up(self) -> None:
+        self._move_cursor(self.cursor - max(1, self.size.height - 1))
+
+    def action_cursor_page_down(self) -> None:
+        self._move_cursor(self.cursor + max(1, self.size.height - 1))
+
+    def action_cursor_home(self) -> None:
+        self._move_cursor(0)
+
+    def action_cursor_end(self) -> None:
+        self._move_cursor(len(self.order) - 1)
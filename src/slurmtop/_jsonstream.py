@@ -0,0 +1,118 @@
+import json
+from typing import Callable, Dict, List, Sequence
+
+_WHITESPACE = " \t\n\r"
+
+
+class JobStreamParser:
+    """Incremental parser for ``squeue --json`` documents.
+
+    The top-level object is walked key by key as chunks are fed. Elements of
+    its ``jobs`` array are decoded one at a time and reduced to ``fields``
+    before the next one is read, so at most one complete job object is alive
+    at any time and memory does not grow with the size of the document.
+    Other top-level values listed in ``meta_keys`` are kept in ``meta``.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        keep: Callable[[Dict], bool] = None,
+        meta_keys: Sequence[str] = ("last_update", "last_backfill"),
+    ):
+        self.fields = tuple(fields)
+        self.keep = keep  # Optional predicate on reduced jobs
+        self.meta_keys = set(meta_keys)
+        self.jobs: List[Dict] = []
+        self.meta: Dict = {}
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._closed = False
+
+    def feed(self, chunk: str) -> None:
+        """Consume a chunk of the document, parsing every complete element."""
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        self._parse()
+
+    def close(self) -> List[Dict]:
+        """Signal the end of the document and return the reduced jobs."""
+        self._closed = True
+        self._parse()
+        if self._state != "done":
+            raise ValueError("Truncated squeue JSON document")
+        return self.jobs
+
+    def _skip_whitespace(self) -> bool:
+        """Move to the next significant character, False if none is buffered."""
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buffer)
+
+    def _decode(self):
+        """Decode the value at the cursor, raising EOFError if incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._closed:
+                raise
+            raise EOFError
+        # A number touching the end of the buffer may have more digits coming
+        if end == len(self._buffer) and not self._closed:
+            raise EOFError
+        self._pos = end
+        return value
+
+    def _expect(self, char: str) -> None:
+        if self._buffer[self._pos] != char:
+            raise ValueError(
+                f"Expected {char!r} at offset {self._pos} of squeue JSON chunk"
+            )
+        self._pos += 1
+
+    def _parse(self) -> None:
+        try:
+            while self._state != "done" and self._skip_whitespace():
+                char = self._buffer[self._pos]
+                if self._state == "start":
+                    self._expect("{")
+                    self._state = "key"
+                elif self._state == "key":
+                    if char == ",":
+                        self._pos += 1
+                    elif char == "}":
+                        self._pos += 1
+                        self._state = "done"
+                    else:
+                        self._key = self._decode()
+                        self._state = "colon"
+                elif self._state == "colon":
+                    self._expect(":")
+                    self._state = "value"
+                elif self._state == "value":
+                    if self._key == "jobs":
+                        self._expect("[")
+                        self._state = "jobs"
+                    else:
+                        value = self._decode()
+                        if self._key in self.meta_keys:
+                            self.meta[self._key] = value
+                        self._state = "key"
+                elif self._state == "jobs":
+                    if char == ",":
+                        self._pos += 1
+                    elif char == "]":
+                        self._pos += 1
+                        self._state = "key"
+                    else:
+                        job = self._decode()
+                        job = {key: job[key] for key in self.fields if key in job}
+                        if self.keep is None or self.keep(job):
+                            self.jobs.append(job)
+        except EOFError:
+            pass  # Wait for the next chunk
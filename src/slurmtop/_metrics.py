@@ -0,0 +1,94 @@
+from typing import Dict, List
+
+from ._jobtable import JobTable
+
+# Fields of the partition and user counters
+RUNNING, PENDING, RUNNING_NODES = range(3)
+
+
+class JobMetrics:
+    """Aggregates of a job list, maintained incrementally from job diffs.
+
+    Every job adds to a few counters: per partition and per user running and
+    pending jobs and running nodes, jobs per state, and pending jobs per
+    reason. Applying a SqueueDiff takes back the contribution of the jobs that
+    left or changed and adds the one of the new and changed jobs, so that an
+    update costs O(changes) instead of a pass over the whole queue.
+
+    Partitions of other clusters than the default one are counted under their
+    ``PartitionStatus.label``, e.g. ``cluster/partition``.
+    """
+
+    # Columns a job contribution depends on
+    keys = frozenset(("partition", "user_name", "job_state", "node_number", "reason"))
+
+    def __init__(self):
+        self.partitions: Dict[str, List[int]] = {}
+        self.users: Dict[str, List[int]] = {}
+        self.states: Dict[str, int] = {}
+        self.pending_reasons: Dict[str, int] = {}
+        self.jobs = 0
+
+    def copy(self) -> "JobMetrics":
+        metrics = JobMetrics()
+        metrics.partitions = {key: list(c) for key, c in self.partitions.items()}
+        metrics.users = {key: list(c) for key, c in self.users.items()}
+        metrics.states = dict(self.states)
+        metrics.pending_reasons = dict(self.pending_reasons)
+        metrics.jobs = self.jobs
+        return metrics
+
+    @property
+    def running_nodes(self) -> int:
+        return sum(counts[RUNNING_NODES] for counts in self.partitions.values())
+
+    def rebuild(self, table: JobTable) -> None:
+        """Recompute every aggregate in a single pass over ``table``."""
+        self.__init__()
+        for row in range(len(table)):
+            self.add(table, row)
+
+    def apply(self, previous: JobTable, table: JobTable, diff) -> None:
+        """Update the aggregates of ``previous`` to those of ``table``."""
+        previous_rows, rows = previous.rows, table.rows
+        for job_key in diff.removed:
+            self.add(previous, previous_rows[job_key], -1)
+        for job_key, keys in diff.changed.items():
+            if not self.keys.isdisjoint(keys):
+                self.add(previous, previous_rows[job_key], -1)
+                self.add(table, rows[job_key])
+        for job_key in diff.added:
+            self.add(table, rows[job_key])
+
+    def add(self, table: JobTable, row: int, sign: int = 1) -> None:
+        """Add (or with ``sign=-1``, take back) the contribution of a job."""
+        state = table.job_state[row]
+        self.jobs += sign
+        _count(self.states, state, sign)
+        if state == "PENDING":
+            _count(self.pending_reasons, table.reason[row], sign)
+            field, nodes = PENDING, 0
+        elif state == "RUNNING":
+            field, nodes = RUNNING, table.node_count[row]
+        else:
+            return
+        partition, cluster = table.partition[row], table.cluster[row]
+        for counters, key in (
+            (self.partitions, f"{cluster}/{partition}" if cluster else partition),
+            (self.users, table.user_name[row]),
+        ):
+            counts = counters.get(key)
+            if counts is None:
+                counts = counters[key] = [0, 0, 0]
+            counts[field] += sign
+            counts[RUNNING_NODES] += sign * nodes
+            if not any(counts):
+                del counters[key]
+
+
+def _count(counter: Dict[str, int], key: str, sign: int) -> None:
+    count = counter.get(key, 0) + sign
+    if count:
+        counter[key] = count
+    else:
+        counter.pop(key, None)
@@ -0,0 +1,88 @@
+import re
+from typing import NamedTuple, Tuple
+
+
+class PartitionStatus(NamedTuple):
+    """Allocation of a partition, in nodes and, when known, in CPUs and GPUs."""
+
+    name: str
+    alloc: int  # Nodes allocated, fully or partly
+    idle: int
+    other: int  # Nodes down, drained, ...
+    usage: float  # Percent of the nodes allocated or other
+    cpus_alloc: int = 0  # CPU counts are 0 when only node counts are known
+    cpus_idle: int = 0
+    cpus_other: int = 0
+    gpus_alloc: int = 0
+    gpus_total: int = 0
+    cluster: str = ""  # "" for the default cluster
+
+    @property
+    def label(self) -> str:
+        """Name of the partition, prefixed with its cluster if not the default."""
+        return f"{self.cluster}/{self.name}" if self.cluster else self.name
+
+    @property
+    def total(self) -> int:
+        return self.alloc + self.idle + self.other
+
+    @property
+    def cpus_total(self) -> int:
+        return self.cpus_alloc + self.cpus_idle + self.cpus_other
+
+    @property
+    def load(self) -> float:
+        """Percent of the CPUs allocated or other, of the nodes if unknown."""
+        if not self.cpus_total:
+            return self.usage
+        return round((self.cpus_alloc + self.cpus_other) / self.cpus_total * 100, 2)
+
+
+class NodeStatus(NamedTuple):
+    """State and allocation of a node."""
+
+    name: str
+    state: str  # Long state, with its flags, e.g. "mixed" or "down*"
+    partitions: Tuple[str, ...]
+    cpus_alloc: int
+    cpus_idle: int
+    cpus_other: int
+    gpus_alloc: int
+    gpus_total: int
+    cluster: str = ""  # "" for the default cluster
+
+
+class SinfoSnapshot(NamedTuple):
+    """Immutable partition and node status, as published to subscribers."""
+
+    partitions: Tuple[PartitionStatus, ...]
+    nodes: Tuple[NodeStatus, ...] = ()  # Empty when only a summary is known
+
+
+# Node categories of the sinfo A/I/O/T counts
+ALLOC, IDLE, OTHER = range(3)
+# Base node states counted as allocated or idle, any other being "other"
+NODE_CATEGORIES = {
+    "allocated": ALLOC,
+    "mixed": ALLOC,
+    "completing": ALLOC,
+    "idle": IDLE,
+}
+
+
+def node_category(state: str) -> int:
+    """ALLOC, IDLE or OTHER, for a long node state such as ``mixed~``."""
+    if state.endswith("*"):  # Not responding
+        return OTHER
+    return NODE_CATEGORIES.get(state.rstrip("~#!%$@^-+"), OTHER)
+
+
+def gpu_count(gres: str) -> int:
+    """GPUs of a sinfo GRES field, e.g. 4 for ``gpu:a100:4(S:0-1),nvme:1``."""
+    count = 0
+    # Drop the socket or index lists, which may contain commas
+    for item in re.sub(r"\([^)]*\)", "", gres).split(","):
+        fields = item.strip().split(":")
+        if fields[0] == "gpu" and fields[-1].isdigit():
+            count += int(fields[-1])
+    return count
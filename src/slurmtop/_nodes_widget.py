@@ -0,0 +1,208 @@
+import zlib
+from typing import List, Optional
+
+from rich.segment import Segment
+from rich.style import Style
+from textual.binding import Binding
+from textual.events import Leave, MouseMove
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from ._data import SlurmData, SqueueSnapshot
+from ._hostlist import NodeAllocation, NodeIndex
+from ._nodes import ALLOC, IDLE, SinfoSnapshot, node_category
+
+
+class NodeHeatmap(ScrollView, can_focus=True):
+    """Every node of the clusters as one cell, coloured by state or by user.
+
+    Nodes are laid out in natural order, so that racks stay together. The
+    node index is only rebuilt when the node list changes, and the jobs of
+    every node when the job list does, from hostlist bitsets cached across
+    refreshes. Hovering a node looks its jobs up in O(1).
+    """
+
+    DEFAULT_CSS = """
+    NodeHeatmap {
+        width: 60%;
+        border: round;
+        scrollbar-size: 1 1;
+        scrollbar-background: black 0%;
+        display: none;
+    }
+    """
+    BORDER_TITLE = "NODES"
+    BINDINGS = [Binding("c", "cycle_colors", "Colours")]
+
+    color_modes = ("state", "user")
+    cell = "■"
+    # Colours of the node states, as in the partition table
+    state_colors = {"mixed": "yellow", ALLOC: "red", IDLE: "green"}
+    other_color = "orange1"  # Down, drained, ...
+    # Colours of the users, picked from a hash of their name
+    user_colors = (
+        "red",
+        "green",
+        "yellow",
+        "blue",
+        "magenta",
+        "cyan",
+        "bright_red",
+        "bright_green",
+        "bright_yellow",
+        "bright_blue",
+        "bright_magenta",
+        "bright_cyan",
+    )
+    shared_color = "white"  # Nodes shared by the jobs of several users
+    free_color = "grey30"  # Nodes without any job
+
+    def __init__(self, slurm: SlurmData):
+        super().__init__()
+        self.slurm = slurm
+        self.color_mode = self.color_modes[0]
+        self.index = NodeIndex(())
+        self.allocation: Optional[NodeAllocation] = None  # Jobs of every node
+        self.states: List[str] = []  # State of every node position
+        self._sinfo: Optional[SinfoSnapshot] = None
+        self._squeue: Optional[SqueueSnapshot] = None
+        self._styles: List[Style] = []  # Colour of every node position
+
+    def on_mount(self) -> None:
+        self.slurm.subscribe("sinfo", self.refresh_nodes)
+        self.slurm.subscribe("squeue", self.refresh_jobs)
+
+    def on_unmount(self) -> None:
+        self.slurm.unsubscribe("sinfo", self.refresh_nodes)
+        self.slurm.unsubscribe("squeue", self.refresh_jobs)
+        self.app.frames.cancel(self)
+
+    def on_show(self) -> None:
+        self.draw()
+
+    def refresh_nodes(self, snapshot: SinfoSnapshot) -> None:
+        self._sinfo = snapshot
+        self.app.frames.schedule(self, self.draw)
+
+    def refresh_jobs(self, snapshot: SqueueSnapshot) -> None:
+        self._squeue = snapshot
+        self.app.frames.schedule(self, self.draw)
+
+    def draw(self) -> None:
+        """Update the index and the colours from the latest snapshots.
+
+        Nothing is computed while the heatmap is hidden.
+        """
+        if not self.display or self._sinfo is None:
+            return
+        nodes = self._sinfo.nodes
+        keys = [(node.cluster, node.name) for node in nodes]
+        if len(keys) != len(self.index) or set(keys) != set(self.index.positions):
+            self.index = NodeIndex(keys)
+            self.allocation = None
+        positions = self.index.positions
+        self.states = [""] * len(self.index)
+        for key, node in zip(keys, nodes):
+            self.states[positions[key]] = node.state
+        if self._squeue is not None and (
+            self.allocation is None or self.allocation.table is not self._squeue.table
+        ):
+            self.allocation = self.index.allocation(self._squeue.table)
+        styles = {}  # The same Style object for every node of a colour
+        self._styles = [
+            styles.setdefault(color, Style(color=color))
+            for color in map(self.color, range(len(self.index)))
+        ]
+        self._update_size()
+        self.refresh()
+
+    def color(self, position: int) -> str:
+        """Colour of a node in the current colour mode."""
+        if self.color_mode == "state":
+            state = self.states[position]
+            if state.startswith("mixed"):
+                return self.state_colors["mixed"]
+            return self.state_colors.get(node_category(state), self.other_color)
+        users = self.users(position)
+        if not users:
+            return self.free_color
+        if len(users) > 1:
+            return self.shared_color
+        user_hash = zlib.crc32(users[0].encode())
+        return self.user_colors[user_hash % len(self.user_colors)]
+
+    def users(self, position: int) -> List[str]:
+        """Users of the jobs on a node, in job order."""
+        if self.allocation is None:
+            return []
+        user_names = self.allocation.table.user_name
+        users = []
+        for row in self.allocation.rows_on(position):
+            if user_names[row] not in users:
+                users.append(user_names[row])
+        return users
+
+    def on_resize(self) -> None:
+        self._update_size()
+
+    def _update_size(self) -> None:
+        width = max(1, self.size.width)
+        self.virtual_size = Size(width, -(-len(self.index) // width))
+
+    def render_line(self, y: int) -> Strip:
+        base_style = self.rich_style
+        width = max(1, self.size.width)
+        if not self.index.nodes:
+            text = "No node status from sinfo" if y == 0 else ""
+            return Strip([Segment(text.ljust(width), base_style)], width)
+        start = (int(self.scroll_offset.y) + y) * width
+        styles = self._styles[start : start + width]
+        segments = []
+        run_start = 0
+        # One segment per run of nodes of the same colour
+        for offset in range(1, len(styles) + 1):
+            if offset == len(styles) or styles[offset] is not styles[run_start]:
+                style = base_style + styles[run_start]
+                segments.append(Segment(self.cell * (offset - run_start), style))
+                run_start = offset
+        return Strip(segments).extend_cell_length(width, base_style)
+
+    def position_at(self, event: MouseMove) -> Optional[int]:
+        offset = event.get_content_offset(self)
+        if offset is None or offset.x >= self.size.width:
+            return None
+        position = (int(self.scroll_offset.y) + offset.y) * self.size.width + offset.x
+        return position if position < len(self.index) else None
+
+    def on_mouse_move(self, event: MouseMove) -> None:
+        """Describe the node under the mouse, and its jobs."""
+        position = self.position_at(event)
+        self.border_subtitle = "" if position is None else self.describe(position)
+
+    def on_leave(self, event: Leave) -> None:
+        self.border_subtitle = ""
+
+    def describe(self, position: int) -> str:
+        cluster, name = self.index.nodes[position]
+        text = f"{cluster}:{name}" if cluster else name
+        text += f" {self.states[position]}"
+        if self.allocation is None:
+            return text
+        table = self.allocation.table
+        rows = self.allocation.rows_on(position)
+        if self.color_mode == "user" and rows:
+            # The whole footprint of the user, from the bitsets of their jobs
+            user = table.user_name[rows[0]]
+            bits = self.allocation.user_bits(user)
+            count = bin(bits).count("1")
+            return f"{text}, {user} on {count} nodes: {self.index.hostlist(bits)}"
+        jobs = ", ".join(f"{table.job_id[row]} {table.user_name[row]}" for row in rows)
+        return f"{text}, jobs {jobs}" if jobs else text
+
+    def action_cycle_colors(self) -> None:
+        """Colour the nodes by the next mode, state or user."""
+        modes = self.color_modes
+        self.color_mode = modes[(modes.index(self.color_mode) + 1) % len(modes)]
+        self.border_title = f"NODES by {self.color_mode}"
+        self.draw()
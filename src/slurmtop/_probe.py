@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from ._runner import CommandRunner, SlurmCommandError
+
+# Counters of `sdiag` that change with the job list of the controller
+MARKER_LINES = (
+    "Data since",  # Counters reset, e.g. at midnight
+    "Jobs submitted:",
+    "Jobs started:",
+    "Jobs completed:",
+    "Jobs canceled:",
+    "Jobs failed:",
+    "Jobs pending:",
+    "Jobs running:",
+)
+
+
+class ChangeProbe:
+    """Cheap check of whether the controller state changed, before a refresh.
+
+    ``sdiag`` is answered from the statistics of slurmctld, without reading
+    its job and node tables: the jobs submitted, started, completed, canceled
+    and failed so far make a marker that changes with the queue. A source
+    whose marker is unchanged since its last fetch skips the fetch, at most
+    ``max_skips`` times in a row, since pending reasons, priorities and node
+    states are not counted. A failed probe lets the refresh fetch, and once
+    sdiag failed ``max_failures`` times in a row (e.g. it is restricted to
+    operators), probing stops.
+
+    Every source shares the same sdiag calls: a marker is reused by the
+    probes of the next ``max_age`` seconds, typically one refresh interval.
+    """
+
+    max_skips = 5  # Refreshes skipped in a row at most
+    max_failures = 3  # Probes failed in a row before probing stops
+    timeout = 5.0  # Seconds allowed to sdiag
+
+    def __init__(
+        self, runner: CommandRunner, clusters: Sequence[str] = (), max_age: float = 0.0
+    ):
+        self.runner = runner
+        self.clusters = list(clusters)
+        self.max_age = max_age  # Seconds a marker is shared by every source
+        self.enabled = True
+        self.failures = 0  # Probes failed in a row
+        self._markers: Dict[str, Tuple] = {}  # source -> marker of its last fetch
+        self._skips: Dict[str, int] = {}  # source -> refreshes skipped in a row
+        self._probe = None  # (start time, task) of the last sdiag calls
+
+    async def marker(self) -> Optional[Tuple]:
+        """The counters of every cluster, None once probing is disabled.
+
+        Probes started less than ``max_age`` seconds ago, or still in
+        progress, are awaited rather than repeated.
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if self._probe is None or (
+            self._probe[1].done() and now - self._probe[0] >= self.max_age
+        ):
+            self._probe = (now, asyncio.ensure_future(self._fetch_marker()))
+        # Shielded, a cancelled source does not cancel the probe of the others
+        return await asyncio.shield(self._probe[1])
+
+    async def _fetch_marker(self) -> Optional[Tuple]:
+        try:
+            outputs = await asyncio.gather(
+                *(
+                    self.runner.run(
+                        ["sdiag"] + ([f"--cluster={cluster}"] if cluster else []),
+                        timeout=self.timeout,
+                    )
+                    for cluster in self.clusters or [""]
+                )
+            )
+        except SlurmCommandError as e:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                print(f"Error probing the controller, always refreshing: {e}")
+                self.enabled = False
+            return None
+        self.failures = 0
+        return tuple(
+            line.strip()
+            for output in outputs
+            for line in output.splitlines()
+            if line.strip().startswith(MARKER_LINES)
+        )
+
+    async def changed(self, source: str) -> bool:
+        """Whether ``source`` should be fetched, its marker being recorded."""
+        marker = await self.marker()
+        if marker is None:
+            return True
+        skips = self._skips.get(source, 0)
+        if marker == self._markers.get(source) and skips < self.max_skips:
+            self._skips[source] = skips + 1
+            return False
+        self._markers[source] = marker
+        self._skips[source] = 0
+        return True
+
+    def forget(self, source: str) -> None:
+        """Fetch ``source`` at its next refresh, e.g. after a failed fetch."""
+        self._markers.pop(source, None)
@@ -0,0 +1,86 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Tuple
+
+# Stages of a refresh, in pipeline order
+STAGES = ("spawn", "wait", "parse", "process", "diff", "render", "refresh")
+
+
+class Profiler:
+    """Per-stage timings of the refreshes of each data source.
+
+    Stages timed between two ``flush(source)`` calls are summed into one
+    refresh cycle. The last ``window`` cycles are kept to compute rolling
+    percentiles and, with a ``path``, every cycle is appended to it as a JSON
+    line ``{"t": epoch, "source": name, "stages": {stage: seconds}}``.
+    """
+
+    window = 100  # Refresh cycles kept per stage
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._file = None
+        self._current: Dict[str, Dict[str, float]] = {}
+        self._history: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, source: str, stage: str, seconds: float) -> None:
+        stages = self._current.setdefault(source, {})
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, source: str, stage: str) -> Iterator[None]:
+        """Time the enclosed block as a ``stage`` of ``source``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(source, stage, time.perf_counter() - start)
+
+    def flush(self, source: str) -> None:
+        """Close the current refresh cycle of ``source``."""
+        stages = self._current.pop(source, None)
+        if not stages:
+            return
+        for stage, seconds in stages.items():
+            history = self._history.get((source, stage))
+            if history is None:
+                history = self._history[(source, stage)] = deque(maxlen=self.window)
+            history.append(seconds)
+        if self.path is not None:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            line = {"t": time.time(), "source": source, "stages": stages}
+            self._file.write(json.dumps(line) + "\n")
+            self._file.flush()
+
+    def stats(self) -> List[Tuple[str, str, float, float, float]]:
+        """(source, stage, last, p50, p95) of every stage timed, in seconds."""
+        rows = []
+        for (source, stage), history in self._history.items():
+            ordered = sorted(history)
+            rows.append(
+                (
+                    source,
+                    stage,
+                    history[-1],
+                    _percentile(ordered, 0.50),
+                    _percentile(ordered, 0.95),
+                )
+            )
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        rows.sort(key=lambda row: (row[0], order.get(row[1], len(order)), row[1]))
+        return rows
+
+    def close(self) -> None:
+        for source in list(self._current):
+            self.flush(source)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,52 @@
+from rich.table import Table
+from textual.widgets import Static
+
+from ._data import SlurmData
+
+
+class ProfileOverlay(Static):
+    """Last, median and 95th percentile duration of every refresh stage."""
+
+    DEFAULT_CSS = """
+    ProfileOverlay {
+        layer: overlay;
+        dock: right;
+        width: auto;
+        height: auto;
+        border: round $warning;
+        background: $surface;
+        display: none;
+        }
+    """
+    BORDER_TITLE = "PROFILE"
+
+    def __init__(self, slurm: SlurmData):
+        super().__init__()
+        self.slurm = slurm
+
+    def on_unmount(self) -> None:
+        self.app.frames.remove_ticker(self.refresh_stats)
+
+    def toggle(self) -> None:
+        """Show or hide the overlay, redrawn every second only while shown."""
+        self.display = not self.display
+        if self.display:
+            self.app.frames.add_ticker(self.refresh_stats)
+            self.refresh_stats()
+        else:
+            self.app.frames.remove_ticker(self.refresh_stats)
+
+    def refresh_stats(self) -> None:
+        """Redraw the timings."""
+        stats_table = Table(box=None, padding=(0, 1), header_style="bold")
+        stats_table.add_column("Source", style="cyan")
+        stats_table.add_column("Stage")
+        for column in ("Last", "p50", "p95"):
+            stats_table.add_column(f"{column} ms", justify="right")
+        for source, stage, last, p50, p95 in self.slurm.profiler.stats():
+            stats_table.add_row(
+                source,
+                stage,
+                *(f"{seconds * 1000:.1f}" for seconds in (last, p50, p95)),
+            )
+        self.update(stats_table)
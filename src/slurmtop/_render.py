@@ -0,0 +1,70 @@
+import time
+from typing import Callable, Dict, Hashable, List
+
+from textual.app import App
+
+Draw = Callable[[], None]
+
+
+class FrameScheduler:
+    """Coalesces the redraws of every widget into frames, at most ``max_fps``
+    per second.
+
+    A draw scheduled under a key replaces the one still pending under it, so
+    a burst of snapshots costs a single redraw, and every draw pending when a
+    frame is due runs inside one ``App.batch_update``, so the screen is
+    composited once. The clocks of the widgets share a single 1 s ticker. An
+    idle app has nothing scheduled and wakes up once per second at most.
+    """
+
+    def __init__(self, app: App, max_fps: float = 10.0):
+        self.app = app
+        self.max_fps = max_fps
+        self._pending: Dict[Hashable, Draw] = {}  # key -> draw, in schedule order
+        self._scheduled = False  # Whether a frame is due, i.e. draws are pending
+        self._last_frame = 0.0  # time.monotonic() of the last frame
+        self._tickers: List[Draw] = []
+        self._ticker = None
+
+    def schedule(self, key: Hashable, draw: Draw) -> None:
+        """Run ``draw`` in the next frame, instead of any draw pending under
+        ``key``, e.g. the widget being drawn."""
+        self._pending[key] = draw
+        if not self._scheduled:
+            self._scheduled = True
+            delay = self._last_frame + 1 / self.max_fps - time.monotonic()
+            if delay > 0:
+                self.app.set_timer(delay, self.flush)
+            else:
+                self.app.call_later(self.flush)  # Once the current message is done
+
+    def cancel(self, key: Hashable) -> None:
+        """Drop the draw pending under ``key``, e.g. of a widget unmounted."""
+        self._pending.pop(key, None)
+
+    def flush(self) -> None:
+        """Run every pending draw, in a single batch."""
+        self._scheduled = False
+        self._last_frame = time.monotonic()
+        pending, self._pending = self._pending, {}
+        with self.app.batch_update():
+            for draw in pending.values():
+                draw()
+
+    def add_ticker(self, callback: Draw) -> None:
+        """Call ``callback`` every second, in the same batch as other tickers."""
+        self._tickers.append(callback)
+        if self._ticker is None:
+            self._ticker = self.app.set_interval(1.0, self.tick)
+
+    def remove_ticker(self, callback: Draw) -> None:
+        if callback in self._tickers:
+            self._tickers.remove(callback)
+        if not self._tickers and self._ticker is not None:
+            self._ticker.stop()
+            self._ticker = None
+
+    def tick(self) -> None:
+        with self.app.batch_update():
+            for callback in list(self._tickers):
+                callback()
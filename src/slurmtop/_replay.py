@@ -0,0 +1,458 @@
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from ._data import SinfoData, SqueueData, SqueueQuery
+from ._hostlist import compress
+from ._nodes import OTHER, node_category
+from ._runner import (
+    CHUNK_SIZE,
+    CommandRunner,
+    SlurmCommandError,
+    UnsupportedCommandError,
+)
+
+
+def command_digest(args: Tuple[str, ...], env: Dict[str, str] = None) -> str:
+    """Stable file name stem of a command and its extra environment."""
+    key = json.dumps([list(args), sorted((env or {}).items())])
+    return f"{args[0]}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+
+def feed_parser(parser: Any, chunks: Iterable[str]) -> Any:
+    """Feed ``chunks`` to a streaming parser as the runner would."""
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+    except ValueError as e:
+        raise UnsupportedCommandError(f"Invalid output: {e}") from e
+
+
+def _split(text: str) -> Iterable[str]:
+    for start in range(0, len(text), CHUNK_SIZE):
+        yield text[start : start + CHUNK_SIZE]
+
+
+class RecordingRunner(CommandRunner):
+    """Runs commands for real and saves every output to ``directory``.
+
+    Successive outputs of a command are numbered, so that a session can be
+    replayed refresh after refresh by a ReplayRunner.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self._counts: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, args: Tuple[str, ...], env: Dict[str, str], output: str) -> None:
+        """Save the next output of a command."""
+        stem = command_digest(args, env)
+        count = self._counts.get(stem, 0)
+        self._counts[stem] = count + 1
+        path = os.path.join(self.directory, f"{stem}.{count}.out")
+        with open(path, "w") as f:
+            f.write(output)
+        if count == 0:  # Human readable index of the recordings
+            with open(os.path.join(self.directory, f"{stem}.cmd"), "w") as f:
+                json.dump({"args": list(args), "env": env or {}}, f)
+
+    async def _run(
+        self,
+        args: Tuple[str, ...],
+        timeout: float,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        # The whole output is needed on disk, so it is parsed afterwards
+        output = await super()._run(args, timeout, env)
+        self.save(args, env, output)
+        if parser is not None:
+            return feed_parser(parser(), _split(output))
+        return output
+
+
+class ReplayRunner(CommandRunner):
+    """Serves the outputs saved by a RecordingRunner, without Slurm.
+
+    Each command gets its recorded outputs in order, the last one being
+    repeated once they are exhausted. Commands that were never recorded fail
+    like a missing Slurm CLI would.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self._counts: Dict[str, int] = {}
+
+    def _path(self, stem: str, count: int) -> str:
+        return os.path.join(self.directory, f"{stem}.{count}.out")
+
+    async def _run(
+        self,
+        args: Tuple[str, ...],
+        timeout: float,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        stem = command_digest(args, env)
+        count = self._counts.get(stem, 0)
+        if count and not os.path.exists(self._path(stem, count)):
+            count -= 1
+        else:
+            self._counts[stem] = count + 1
+        try:
+            with open(self._path(stem, count), "r") as f:
+                output = f.read()
+        except OSError as e:
+            # As if the recorded Slurm did not support the command
+            raise UnsupportedCommandError(
+                f"No recording of {' '.join(args)}: {e}"
+            ) from e
+        if parser is not None:
+            return feed_parser(parser(), _split(output))
+        return output
+
+
+PENDING_REASONS = ("Priority", "Resources", "Dependency", "QOSMaxJobsPerUserLimit")
+
+
+def _number(value: int) -> Dict:
+    """A number field of `squeue --json`."""
+    return {"set": True, "infinite": False, "number": value}
+
+
+def synthetic_job(
+    job_id: int, rng: random.Random, now: int = 1700000000, partitions: int = 4
+) -> Dict:
+    """A job shaped like the ones of `squeue --json`, unused fields included."""
+    running = rng.random() < 0.6
+    return {
+        "account": f"acc{job_id % 40}",
+        "accrue_time": _number(now - 10000),
+        "admin_comment": "",
+        "array_job_id": _number(0),
+        "array_task_id": _number(0),
+        "batch_flag": True,
+        "batch_host": f"r1i{job_id % 8}n{job_id % 36}",
+        "command": f"/home/user{job_id % 300}/jobs/run_{job_id}.slurm",
+        "cpus": _number(40),
+        "current_working_directory": f"/home/user{job_id % 300}/jobs",
+        "exit_code": {"status": ["SUCCESS"], "return_code": _number(0)},
+        "flags": ["EXACT_CPU_COUNT_REQUESTED", "USING_DEFAULT_QOS"],
+        "group_name": "users",
+        "job_id": job_id,
+        "job_resources": {"nodes": {"count": 1, "list": "r1i0n0"}, "cpus": 40},
+        "job_state": ["RUNNING" if running else "PENDING"],
+        "memory_per_node": _number(160000),
+        "name": f"simulation_{job_id}",
+        "node_count": _number(rng.randint(1, 16)),
+        "nodes": f"r1i{job_id % 8}n[0-{job_id % 36}]" if running else "",
+        "partition": f"cpu_p{job_id % partitions}",
+        "priority": _number(rng.randint(1, 500000)),
+        "qos": "qos_cpu-t3",
+        "standard_error": f"/home/user{job_id % 300}/jobs/run_{job_id}.err",
+        "standard_output": f"/home/user{job_id % 300}/jobs/run_{job_id}.out",
+        "start_time": _number(now - rng.randint(0, 200000) if running else 0),
+        "state_reason": "None" if running else rng.choice(PENDING_REASONS),
+        "submit_time": _number(now - 200000),
+        "tasks": _number(40),
+        "time_limit": _number(rng.choice((1200, 2880, 6000))),  # Minutes
+        "tres_req_str": "cpu=40,mem=160000M,node=1,billing=40",
+        "user_name": f"user{job_id % 300}",
+    }
+
+
+class SyntheticRunner(CommandRunner):
+    """Answers Slurm commands for a generated cluster, without Slurm.
+
+    The cluster has ``partitions`` partitions and ``jobs`` jobs. Jobs are
+    generated deterministically from ``seed`` and their id; every squeue call
+    after the first one replaces a ``churn`` fraction of them, oldest first,
+    so that successive refreshes produce realistic deltas.
+
+    Commands sent to another cluster with ``--clusters=NAME`` (or
+    ``--cluster=NAME`` for sdiag) are answered by a cluster of the same size,
+    seeded from its name.
+    """
+
+    slurm_version = "23.02.7"
+    cpus_per_node = 40
+    gpus_per_node = 4  # On every 4th partition
+
+    def __init__(
+        self,
+        partitions: int = 4,
+        jobs: int = 1000,
+        seed: int = 0,
+        churn: float = 0.0,
+        now: int = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.partitions = partitions
+        self.jobs = jobs
+        self.seed = seed
+        self.churn = churn
+        self.now = int(now or time.time())  # Jobs started before this epoch
+        self.first_job = 1
+        self._squeue_calls = 0
+        self._clusters: Dict[str, "SyntheticRunner"] = {}
+
+    def cluster(self, name: str) -> "SyntheticRunner":
+        """The generated cluster answering ``--clusters=NAME``."""
+        runner = self._clusters.get(name)
+        if runner is None:
+            runner = self._clusters[name] = SyntheticRunner(
+                self.partitions,
+                self.jobs,
+                zlib.crc32(name.encode()),
+                self.churn,
+                self.now,
+                profiler=self.profiler,
+            )
+        return runner
+
+    def job(self, job_id: int) -> Dict:
+        """A job of the cluster, running on nodes of its partition."""
+        rng = random.Random(self.seed * 1000003 + job_id)
+        job = synthetic_job(job_id, rng, self.now, self.partitions)
+        if job["nodes"]:
+            index = job_id % self.partitions
+            count = job["node_count"]["number"]
+            start = rng.randrange(self.partition_size(index) - count + 1)
+            names = [f"r{index}i{number}" for number in range(start, start + count)]
+            job["nodes"] = compress(names)
+            job["batch_host"] = names[0]
+        return job
+
+    def iter_jobs(self) -> Iterable[Dict]:
+        return map(self.job, range(self.first_job, self.first_job + self.jobs))
+
+    def partition_size(self, index: int) -> int:
+        """Nodes of a partition, as drawn by ``partition_nodes``."""
+        return random.Random(self.seed * 7919 + index).randint(16, 1024)
+
+    def partition_nodes(self, index: int) -> List[Tuple[str, str, int, int]]:
+        """(name, state, allocated CPUs, GPUs) of the nodes of a partition."""
+        rng = random.Random(self.seed * 7919 + index)
+        total = rng.randint(16, 1024)
+        alloc = rng.randint(0, total)
+        other = rng.randint(0, total - alloc)
+        gpus = self.gpus_per_node if index % 4 == 3 else 0
+        nodes = []
+        for number in range(total):
+            if number < alloc:
+                state = "allocated" if number % 2 else "mixed"
+                cpus = (
+                    self.cpus_per_node
+                    if number % 2
+                    else rng.randint(1, self.cpus_per_node - 1)
+                )
+            elif number < alloc + other:
+                state, cpus = ("drained", 0) if number % 2 else ("down*", 0)
+            else:
+                state, cpus = "idle", 0
+            nodes.append((f"r{index}i{number}", state, cpus, gpus))
+        return nodes
+
+    def partition_name(self, index: int) -> str:
+        return f"cpu_p{index}{'*' if index == 0 else ''}"
+
+    def sinfo_summary(self) -> str:
+        """``sinfo -sh`` output, one line per partition."""
+        lines = []
+        for index in range(self.partitions):
+            counts = [0, 0, 0]
+            nodes = self.partition_nodes(index)
+            for _, state, _, _ in nodes:
+                counts[node_category(state)] += 1
+            alloc, idle, other = counts
+            lines.append(
+                f"{self.partition_name(index)} up 20:00:00 "
+                f"{alloc}/{idle}/{other}/{len(nodes)} r{index}i[0-{len(nodes) - 1}]"
+            )
+        return "\n".join(lines) + "\n"
+
+    def sinfo_nodes(self) -> str:
+        """``sinfo -h -N -O SinfoData.sinfo_format`` output."""
+        lines = []
+        for index in range(self.partitions):
+            partition = self.partition_name(index)
+            for name, state, cpus, gpus in self.partition_nodes(index):
+                total = self.cpus_per_node
+                other = total if node_category(state) == OTHER else 0
+                gres = f"gpu:a100:{gpus}(S:0-1)" if gpus else "(null)"
+                used = f"gpu:a100:{gpus if cpus else 0}(IDX:N/A)" if gpus else "(null)"
+                lines.append(
+                    f"{partition}|{name}|{state}|"
+                    f"{cpus}/{total - cpus - other}/{other}/{total}|{gres}|{used}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def squeue_format(self, args: Tuple[str, ...]) -> str:
+        """``squeue -h -o SqueueData.squeue_format`` output, query applied."""
+        query = _parse_query(args)
+        lines = []
+        for job in self.iter_jobs():
+            if not query.matches(job):
+                continue
+            start = job["start_time"]["number"]
+            lines.append(
+                "|".join(
+                    (
+                        str(job["job_id"]),
+                        job["partition"],
+                        job["user_name"],
+                        job["job_state"][0],
+                        str(start) if start else "N/A",
+                        str(job["node_count"]["number"]),
+                        str(job["priority"]["number"]),
+                        job["nodes"] or "(null)",
+                        job["state_reason"],
+                        _format_minutes(job["time_limit"]["number"]),
+                        job["name"],
+                    )
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+    def scontrol_job(self, job_id: int) -> str:
+        """``scontrol show job -o`` output of a job still in the queue."""
+        if not self.first_job <= job_id < self.first_job + self.jobs:
+            raise SlurmCommandError(
+                "scontrol exited with code 1: "
+                "slurm_load_jobs error: Invalid job id specified"
+            )
+        job = self.job(job_id)
+        start = job["start_time"]["number"]
+        fields = {
+            "JobId": job_id,
+            "JobName": job["name"],
+            "UserId": f"{job['user_name']}(1{job_id % 300:04})",
+            "Account": job["account"],
+            "QOS": job["qos"],
+            "Partition": job["partition"],
+            "JobState": job["job_state"][0],
+            "Reason": job["state_reason"],
+            "Dependency": "(null)",
+            "Priority": job["priority"]["number"],
+            "SubmitTime": job["submit_time"]["number"],
+            "StartTime": start if start else "Unknown",
+            "TimeLimit": _format_minutes(job["time_limit"]["number"]),
+            "NumNodes": job["node_count"]["number"],
+            "NumCPUs": job["cpus"]["number"],
+            "TRES": job["tres_req_str"],
+            "NodeList": job["nodes"] or "(null)",
+            "BatchHost": job["batch_host"],
+            "WorkDir": job["current_working_directory"],
+            "Command": job["command"],
+            "StdOut": job["standard_output"],
+            "StdErr": job["standard_error"],
+        }
+        return " ".join(f"{key}={value}" for key, value in fields.items()) + "\n"
+
+    def sdiag(self) -> str:
+        """``sdiag`` output, its job counters included.
+
+        The jobs replaced by the next squeue call already count, as if they
+        ended right after the previous one.
+        """
+        first_job = self.first_job
+        if self._squeue_calls:
+            first_job += int(self.jobs * self.churn)
+        since = time.strftime("%a %b %d %H:%M:%S %Y", time.localtime(self.now))
+        now = int(time.time())
+        at = time.strftime("%a %b %d %H:%M:%S %Y", time.localtime(now))
+        return (
+            "*******************************************************\n"
+            f"sdiag output at {at} ({now})\n"
+            f"Data since      {since} ({self.now})\n"
+            "*******************************************************\n"
+            "Server thread count:  3\n"
+            "Agent queue size:     0\n"
+            "\n"
+            f"Jobs submitted: {first_job + self.jobs - 1}\n"
+            f"Jobs started:   {first_job - 1}\n"
+            f"Jobs completed: {first_job - 1}\n"
+            "Jobs canceled:  0\n"
+            "Jobs failed:    0\n"
+        )
+
+    def squeue_json(self) -> Iterable[str]:
+        """``squeue --json`` document, one chunk per job."""
+        yield '{"meta": {"plugin": {"type": "openapi/v0.0.39"}}, "jobs": ['
+        for index, job in enumerate(self.iter_jobs()):
+            yield ("," if index else "") + json.dumps(job)
+        yield f'], "last_update": {{"number": {self.now}}}, "errors": []}}'
+
+    async def _run(
+        self,
+        args: Tuple[str, ...],
+        timeout: float,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        option = next(
+            (arg for arg in args if arg.startswith(("--clusters=", "--cluster="))),
+            None,
+        )
+        if option is not None:
+            name = option.partition("=")[2]
+            args = tuple(arg for arg in args if arg != option)
+            output = await self.cluster(name)._run(args, timeout, env, parser)
+            if args[0] in ("sinfo", "squeue") and "--json" not in args:
+                output = f"CLUSTER: {name}\n" + output  # As printed with -M
+            return output
+        if args == ("sinfo", "-V"):
+            return f"slurm {self.slurm_version}\n"
+        if args == ("sinfo", "-sh"):
+            return self.sinfo_summary()
+        if args == ("sinfo", "-h", "-N", "-O", SinfoData.sinfo_format):
+            return self.sinfo_nodes()
+        if args == ("sdiag",):
+            return self.sdiag()
+        if args[:4] == ("scontrol", "show", "job", "-o"):
+            return self.scontrol_job(int(args[4]))
+        if args[0] == "squeue":
+            if self._squeue_calls:
+                self.first_job += int(self.jobs * self.churn)
+            self._squeue_calls += 1
+            if "--json" in args:
+                chunks = self.squeue_json()
+                if parser is not None:
+                    return feed_parser(parser(), chunks)
+                return "".join(chunks)
+            if args[1:4] == ("-h", "-o", SqueueData.squeue_format):
+                return self.squeue_format(args[4:])
+        raise UnsupportedCommandError(f"Unsupported synthetic command {' '.join(args)}")
+
+
+def _parse_query(args: Iterable[str]) -> SqueueQuery:
+    """Inverse of SqueueQuery.to_args."""
+    options: Dict[str, List[str]] = {}
+    for arg in args:
+        option, _, value = arg.partition("=")
+        options[option] = value.split(",")
+    return SqueueQuery(
+        users=options.get("--user"),
+        partitions=options.get("--partition"),
+        states=options.get("--states"),
+        accounts=options.get("--account"),
+        name=options.get("--name", [None])[0],
+    )
+
+
+def _format_minutes(minutes: int) -> str:
+    """A duration printed as squeue does, e.g. ``1-04:00:00``."""
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}-{hours:02}:{minutes:02}:00"
+    return f"{hours}:{minutes:02}:00"
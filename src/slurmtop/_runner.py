@@ -0,0 +1,189 @@
+import asyncio
+import codecs
+import os
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from ._profile import Profiler
+
+CHUNK_SIZE = 1 << 16  # Bytes read at once from a streamed stdout
+
+# Lowercase stderr of a command rejecting its options, e.g. a format field
+# unknown to the installed Slurm version, rather than failing to run
+REJECTED_OPTIONS = (
+    "invalid option",
+    "unrecognized option",
+    "unknown option",
+    "format specification",
+    "usage:",
+)
+
+
+class SlurmCommandError(RuntimeError):
+    """Raised when a Slurm command cannot be spawned, fails or times out."""
+
+
+class SlurmTimeoutError(SlurmCommandError):
+    """Raised when a Slurm command did not finish within its timeout."""
+
+
+class UnsupportedCommandError(SlurmCommandError):
+    """Raised when a command line is rejected, or its output not understood.
+
+    Unlike a timeout or an unreachable controller, running the same command
+    again will fail again: callers may switch to another one for good.
+    """
+
+
+class CommandRunner:
+    """Runs Slurm CLI commands asynchronously, without a shell.
+
+    At most ``max_concurrency`` commands run at the same time, and identical
+    requests issued while one is already in flight share its process.
+    """
+
+    def __init__(
+        self, max_concurrency: int = 4, timeout: float = 30.0, profiler: Profiler = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout  # Default timeout in seconds, per command
+        # Stage timings of every command, shared with the data layer
+        self.profiler = profiler or Profiler()
+        self._semaphore = None  # Created lazily, inside the running loop
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    async def run(
+        self,
+        args: Sequence[str],
+        timeout: float = None,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        """Run ``args`` and return its stdout, merging identical requests.
+
+        ``env`` holds extra environment variables, e.g. ``SLURM_TIME_FORMAT``.
+        With a ``parser`` factory, stdout is never held in memory as a whole:
+        it is fed chunk by chunk to a new parser (an object with ``feed`` and
+        ``close`` methods) and the result of ``close()`` is returned instead.
+        """
+        key = (tuple(args), tuple(sorted((env or {}).items())), parser)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._run(tuple(args), timeout or self.timeout, env, parser)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded so that a cancelled caller does not kill a shared process
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Tuple, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved, callers may have gone away
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(
+        self,
+        args: Tuple[str, ...],
+        timeout: float,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        command = " ".join(args)
+        source = args[0]  # Commands are profiled under the source they feed
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *args,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    env={**os.environ, **env} if env else None,
+                )
+            except OSError as e:
+                raise SlurmCommandError(f"Cannot run {command}: {e}") from e
+            self.profiler.record(source, "spawn", time.perf_counter() - start)
+            start = time.perf_counter()
+            try:
+                if parser is None:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(), timeout
+                    )
+                    parse_time = 0.0
+                else:
+                    stdout, stderr, parse_time = await asyncio.wait_for(
+                        self._stream(process, parser()), timeout
+                    )
+            except asyncio.TimeoutError:
+                _kill(process)
+                await process.wait()
+                raise SlurmTimeoutError(f"{command} timed out after {timeout}s")
+            except ValueError as e:  # Rejected by the parser
+                _kill(process)
+                await process.wait()
+                raise UnsupportedCommandError(
+                    f"Invalid output of {command}: {e}"
+                ) from e
+            except asyncio.CancelledError:
+                _kill(process)
+                raise
+            # Time spent waiting for the controller, parsing apart
+            wait_time = time.perf_counter() - start - parse_time
+            self.profiler.record(source, "wait", wait_time)
+            if parse_time:
+                self.profiler.record(source, "parse", parse_time)
+        if process.returncode != 0:
+            error = stderr.decode("utf-8", errors="replace").strip()
+            rejected = any(text in error.lower() for text in REJECTED_OPTIONS)
+            raise (UnsupportedCommandError if rejected else SlurmCommandError)(
+                f"{command} exited with code {process.returncode}: {error}"
+            )
+        if parser is not None:
+            try:
+                with self.profiler.time(source, "parse"):
+                    return stdout.close()
+            except ValueError as e:
+                raise UnsupportedCommandError(
+                    f"Invalid output of {command}: {e}"
+                ) from e
+        return stdout.decode("utf-8", errors="replace")
+
+    async def _stream(self, process, parser) -> Tuple[Any, bytes, float]:
+        """Feed stdout to ``parser`` as it arrives, while collecting stderr.
+
+        Returns the parser, stderr and the time spent in the parser.
+        """
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parse_time = 0.0
+        try:
+            while True:
+                chunk = await process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                start = time.perf_counter()
+                parser.feed(decoder.decode(chunk))
+                parse_time += time.perf_counter() - start
+            parser.feed(decoder.decode(b"", final=True))
+            await process.wait()
+            return parser, await stderr_task, parse_time
+        finally:
+            stderr_task.cancel()
+
+
+def cluster_args(cluster: str) -> List[str]:
+    """Options sending a Slurm command to ``cluster``, "" being the default."""
+    return [f"--clusters={cluster}"] if cluster else []
+
+
+def _kill(process) -> None:
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass  # Already exited
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List
+
+Subscriber = Callable[[Any], None]
+
+
+class RefreshSource:
+    """A periodically refreshed data source shared by several subscribers.
+
+    ``refresh`` is awaited once per interval and returns an immutable snapshot,
+    or ``None`` when nothing should be published (e.g. the fetch failed).
+    When a refresh takes longer than the current interval, the interval backs
+    off, up to ``max_interval``, and recovers once the controller is fast again.
+    The interval is also multiplied by ``slowdown``, e.g. while nobody looks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        refresh: Callable[[], Awaitable[Any]],
+        interval: float,
+        max_interval: float = None,
+    ):
+        self.name = name
+        self.refresh = refresh
+        self.interval = interval  # Base period, in seconds
+        self.max_interval = max_interval or interval * 12
+        self.current_interval = interval  # Adaptive period actually used
+        self.slowdown = 1.0  # Factor of current_interval between two refreshes
+        self.last_duration = 0.0
+        self.refreshed_at = 0.0  # time.monotonic() at the end of the last refresh
+        self._requested = False  # Whether refresh_now was called
+        self.snapshot = None  # Last published snapshot
+        self.stale = False  # Whether it comes from a previous session
+        self.subscribers: List[Subscriber] = []
+        self.task = None
+        self.wakeup = None  # asyncio.Event, created inside the running loop
+
+    def adapt(self, duration: float) -> None:
+        """Update the adaptive interval after a refresh that took ``duration``."""
+        self.last_duration = duration
+        if duration > self.current_interval:
+            self.current_interval = min(
+                self.max_interval, max(self.current_interval, duration) * 2
+            )
+        elif duration * 2 < self.current_interval:
+            self.current_interval = max(self.interval, self.current_interval / 2)
+
+    def publish(self, snapshot: Any, stale: bool = False) -> None:
+        self.snapshot = snapshot
+        self.stale = stale
+        for callback in list(self.subscribers):
+            callback(snapshot)
+
+    async def poll(self) -> None:
+        """Refresh and publish forever, one fetch per (adaptive) interval."""
+        self.wakeup = asyncio.Event()
+        while True:
+            start = time.monotonic()
+            self._requested = False
+            snapshot = await self.refresh()
+            self.refreshed_at = time.monotonic()
+            self.adapt(self.refreshed_at - start)
+            if snapshot is not None:
+                self.publish(snapshot)
+            await self.wait()
+
+    async def wait(self) -> None:
+        """Wait for the next refresh, the interval being read again whenever
+        the source is woken up, e.g. by a new ``slowdown``."""
+        while not self._requested:
+            wait_time = (
+                self.refreshed_at
+                + self.current_interval * self.slowdown
+                - time.monotonic()
+            )
+            if wait_time <= 0:
+                return
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), wait_time)
+            except asyncio.TimeoutError:
+                return
+            self.wakeup.clear()
+
+    def refresh_now(self) -> None:
+        """Skip the remaining wait and refresh as soon as possible."""
+        self._requested = True
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def set_slowdown(self, slowdown: float) -> None:
+        """Change the factor of the interval, the current wait included."""
+        self.slowdown = slowdown
+        if self.wakeup is not None:
+            self.wakeup.set()
@@ -0,0 +1,251 @@
+import asyncio
+import codecs
+import json
+import os
+import re
+import stat
+import tempfile
+import time
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+from ._data import SinfoData, SqueueData
+from ._runner import (
+    CHUNK_SIZE,
+    CommandRunner,
+    SlurmCommandError,
+    SlurmTimeoutError,
+    UnsupportedCommandError,
+)
+
+# The command lines slurmtop runs, without their cluster option: only these
+# are run on behalf of clients, and only squeue -o takes further options
+ALLOWED_COMMANDS = {
+    ("sdiag",),
+    ("sinfo", "-V"),
+    ("sinfo", "-sh"),
+    ("sinfo", "-h", "-N", "-O", SinfoData.sinfo_format),
+    ("squeue", "--json"),
+}
+SQUEUE_FORMAT = ("squeue", "-h", "-o", SqueueData.squeue_format)
+# Options of a SqueueQuery, see SqueueQuery.to_args
+QUERY_OPTIONS = ("--user=", "--partition=", "--states=", "--account=", "--name=")
+CLUSTER_NAME = re.compile(r"[\w.-]+")
+# Error types forwarded to clients, by the "type" of an error response
+ERROR_TYPES = {"timeout": SlurmTimeoutError, "unsupported": UnsupportedCommandError}
+
+
+def default_socket_path() -> str:
+    """Node-wide socket, shared by every user of the node."""
+    return os.path.join(tempfile.gettempdir(), "slurmtop.sock")
+
+
+def allowed_command(args: Sequence[str], env: Dict[str, str]) -> bool:
+    """Whether ``args`` and ``env`` are a command line slurmtop itself runs.
+
+    A single cluster option may end any of them, ``--cluster`` for sdiag and
+    ``--clusters`` for the others.
+    """
+    args = tuple(args)
+    option = "--cluster=" if args[:1] == ("sdiag",) else "--clusters="
+    if args and args[-1].startswith(option):
+        if not CLUSTER_NAME.fullmatch(args[-1][len(option) :]):
+            return False
+        args = args[:-1]
+    if args[: len(SQUEUE_FORMAT)] == SQUEUE_FORMAT:
+        return env == SqueueData.squeue_env and all(
+            arg.startswith(QUERY_OPTIONS) for arg in args[len(SQUEUE_FORMAT) :]
+        )
+    return not env and args in ALLOWED_COMMANDS
+
+
+def trusted_socket(path: str) -> bool:
+    """Whether the server listening on ``path`` may be trusted with our data.
+
+    In a world-writable directory like /tmp anyone may have bound the path
+    first, only a socket of root or of our own user is trusted. Elsewhere, a
+    socket of the directory owner is trusted too.
+    """
+    owner = os.stat(path).st_uid
+    if owner in (0, os.getuid()):
+        return True
+    directory = os.stat(os.path.dirname(os.path.abspath(path)))
+    return owner == directory.st_uid and not directory.st_mode & stat.S_IWOTH
+
+
+class CacheServer:
+    """Runs Slurm commands for many slurmtop clients over a Unix socket.
+
+    Outputs are cached for ``max_age`` seconds and identical requests are
+    merged by the runner, so the controller sees one poll per command and
+    per node, however many clients are connected.
+
+    Any user of the node may connect, so only the command lines of slurmtop
+    are run, see ``allowed_command``, and for ``max_timeout`` seconds at most.
+
+    Each request is a JSON line ``{"args": [...], "env": {...}, "timeout":
+    seconds}``, answered by a JSON line, either ``{"length": bytes}`` followed
+    by the output or ``{"error": message, "type": type}``, the type being a
+    key of ``ERROR_TYPES`` or null.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        runner: CommandRunner = None,
+        max_age: float = 5.0,
+        max_timeout: float = 60.0,
+    ):
+        self.path = path
+        self.runner = runner or CommandRunner()
+        self.max_age = max_age
+        self.max_timeout = max_timeout
+        self._cache: Dict[Tuple, Tuple[float, bytes]] = {}
+
+    async def fetch(
+        self, args: Tuple[str, ...], env: Dict[str, str], timeout: float = None
+    ) -> bytes:
+        """Output of a command, from the cache while it is fresh enough.
+
+        Raises TypeError if ``args`` or ``env`` is not made of strings.
+        """
+        strings = list(args) + list(env) + list(env.values())
+        if not all(isinstance(string, str) for string in strings):
+            raise TypeError("arguments and environment must be strings")
+        if not allowed_command(args, env):
+            raise UnsupportedCommandError(f"Command not allowed: {' '.join(args)}")
+        if not isinstance(timeout, (int, float)) or not 0 < timeout:  # NaN too
+            timeout = self.runner.timeout
+        timeout = min(timeout, self.max_timeout)
+        key = (args, tuple(sorted(env.items())))
+        now = time.monotonic()
+        # Expired entries are dropped, not only refreshed: clients may ask for
+        # as many distinct queries as they like
+        self._cache = {
+            key: cached
+            for key, cached in self._cache.items()
+            if now - cached[0] < self.max_age
+        }
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached[1]
+        output = await self.runner.run(args, timeout=timeout, env=env or None)
+        data = output.encode("utf-8")
+        self._cache[key] = (time.monotonic(), data)
+        return data
+
+    async def handle(self, reader, writer) -> None:
+        """Answer the request of one client connection."""
+        try:
+            try:
+                request = json.loads(await reader.readline())
+                args, env = request["args"], request.get("env") or {}
+                if not isinstance(args, list) or not isinstance(env, dict):
+                    raise TypeError("args must be a list and env an object")
+                data = await self.fetch(tuple(args), env, request.get("timeout"))
+                header = {"length": len(data)}
+            except (ValueError, KeyError, TypeError) as e:
+                data, header = b"", {"error": f"Invalid request: {e}"}
+            except SlurmCommandError as e:
+                types = [k for k, t in ERROR_TYPES.items() if isinstance(e, t)]
+                data = b""
+                header = {"error": str(e), "type": types[0] if types else None}
+            writer.write(json.dumps(header).encode() + b"\n")
+            writer.write(data)
+            await writer.drain()
+        except ConnectionError:
+            pass  # The client went away
+        finally:
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            try:
+                _, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                os.unlink(self.path)  # Left behind by a server that died
+            else:
+                writer.close()
+                raise SlurmCommandError(f"A server is already running on {self.path}")
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        os.chmod(self.path, 0o666)  # Every user of the node may connect
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            os.unlink(self.path)
+
+
+class SocketRunner(CommandRunner):
+    """Gets command outputs from a CacheServer instead of running them.
+
+    When the server cannot be reached, or its socket is not trusted, see
+    ``trusted_socket``, commands are run by ``fallback`` instead, if given.
+    So are the commands the server does not run, see ``allowed_command``,
+    e.g. the job details subject to the permissions of the user.
+    """
+
+    def __init__(self, path: str, fallback: CommandRunner = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.fallback = fallback
+        self._warned = False  # Whether an untrusted socket was reported
+
+    async def _run(
+        self,
+        args: Tuple[str, ...],
+        timeout: float,
+        env: Dict[str, str] = None,
+        parser: Callable[[], Any] = None,
+    ) -> Any:
+        if not allowed_command(args, env or {}):
+            if self.fallback is None:
+                raise UnsupportedCommandError(f"Not served: {' '.join(args)}")
+            return await self.fallback.run(args, timeout, env, parser)
+        try:
+            if not trusted_socket(self.path):
+                raise PermissionError(f"{self.path} is owned by another user")
+            reader, writer = await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            if self.fallback is None:
+                raise SlurmCommandError(f"Cannot connect to {self.path}: {e}") from e
+            if isinstance(e, PermissionError) and not self._warned:
+                print(f"Not using the cache server: {e}")
+                self._warned = True
+            return await self.fallback.run(args, timeout, env, parser)
+        try:
+            with self.profiler.time(args[0], "wait"):
+                return await asyncio.wait_for(
+                    self._request(reader, writer, args, timeout, env, parser), timeout
+                )
+        except asyncio.TimeoutError:
+            raise SlurmTimeoutError(f"{' '.join(args)} timed out after {timeout}s")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            raise SlurmCommandError(f"Connection to {self.path} lost: {e}") from e
+        finally:
+            writer.close()
+
+    async def _request(self, reader, writer, args, timeout, env, parser) -> Any:
+        request = {"args": list(args), "env": env or {}, "timeout": timeout}
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        try:
+            header = json.loads(await reader.readline() or b"{}")
+            if "length" not in header:
+                error = ERROR_TYPES.get(header.get("type"), SlurmCommandError)
+                raise error(header.get("error", "Empty server response"))
+            # Read in chunks, a streaming parser never holds the whole output
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            parser = parser() if parser is not None else None
+            chunks = []
+            remaining = header["length"]
+            while remaining:
+                chunk = await reader.readexactly(min(CHUNK_SIZE, remaining))
+                remaining -= len(chunk)
+                text = decoder.decode(chunk, final=not remaining)
+                if parser is None:
+                    chunks.append(text)
+                else:
+                    parser.feed(text)
+            return "".join(chunks) if parser is None else parser.close()
+        except ValueError as e:
+            raise SlurmCommandError(f"Invalid output of {' '.join(args)}: {e}") from e
@@ -1,17 +1,14 @@
-import os
-import subprocess
-from asyncio import sleep
+import time
+from typing import Dict, List, Tuple
 
-from rich import box
 from rich.table import Table
-from rich.text import Text
-from textual import work
 from textual.app import ComposeResult
 from textual.containers import VerticalScroll
 from textual.widget import Widget
 from textual.widgets import Label
 
 from ._data import SlurmData
+from ._nodes import PartitionStatus, SinfoSnapshot
 
 
 class PartitionsUtilizationViewer(Widget):
@@ -25,25 +22,103 @@ class PartitionsUtilizationViewer(Widget):
         scrollbar-size: 1 1;
         scrollbar-background: black 0%;
     }
+    PartitionsUtilizationViewer Label {
+        width: 100%;
+    }
     """
     BORDER_TITLE = "SINFO"
 
     def __init__(self, slurm: SlurmData):
         super().__init__()
-        self.sinfo = slurm.sinfo_data
-        self.squeue = slurm.squeue_data
+        self.slurm = slurm
         self.loading = True  # Flag to indicate loading state
+        self._bars: Dict[Tuple[PartitionStatus, int], str] = {}  # Bar markups
+        self._drawn = None  # Content of the table displayed
 
     def compose(self) -> ComposeResult:
         yield VerticalScroll(Label())
 
     def on_mount(self):
-        self.set_interval(5.0, self.refresh_viewer)
-        self.refresh_viewer()
+        self.slurm.subscribe("sinfo", self.refresh_viewer)
+
+    def on_unmount(self):
+        self.slurm.unsubscribe("sinfo", self.refresh_viewer)
+        self.app.frames.cancel(self)
+
+    def refresh_viewer(self, snapshot: SinfoSnapshot) -> None:
+        """Draw a sinfo snapshot in the next frame."""
+        self.app.frames.schedule(self, lambda: self.draw(snapshot))
+
+    def draw(self, snapshot: SinfoSnapshot) -> None:
+        """Redraw the partition table from a sinfo snapshot.
+
+        The load is weighted by CPUs when they are known, by nodes otherwise.
+        The table is only rebuilt when one of its rows changed.
+        """
+        start = time.perf_counter()
+        show_gpus = any(partition.gpus_total for partition in snapshot.partitions)
+        show_clusters = any(partition.cluster for partition in snapshot.partitions)
+        # Room for the GPUs and cluster columns
+        bar_width = 20 - 6 * show_gpus - 6 * show_clusters
 
-    @work  # Make sure this runs asynchronously
-    async def refresh_viewer(self):
-        self.sinfo.refresh_data()
+        bars = {}
+        rows = []
+        for partition in snapshot.partitions:
+            bar_key = (partition, bar_width)
+            bars[bar_key] = self._bars.get(bar_key) or self.bar(partition, bar_width)
+            # Drawn from the history, without any extra Slurm call
+            p_spark = self.slurm.history.sparkline(
+                f"sinfo/{partition.label}/usage", span=3600, width=20, maximum=100
+            )
+            row = [partition.cluster] if show_clusters else []
+            row += [
+                partition.name,
+                bars[bar_key],
+                str(partition.alloc),
+                str(partition.idle),
+                str(partition.other),
+                str(partition.total),
+            ]
+            if show_gpus:
+                gpus = partition.gpus_total
+                row.append(f"{partition.gpus_alloc}/{gpus}" if gpus else "")
+            row.append(p_spark)
+            rows.append(tuple(row))
+        self._bars = bars  # Only the bars of the current partitions are kept
+
+        drawn = (show_gpus, show_clusters, tuple(rows))
+        if drawn != self._drawn:
+            self._drawn = drawn
+            self.query_one(Label).update(self.table(show_gpus, show_clusters, rows))
+        self.slurm.profiler.record("sinfo", "render", time.perf_counter() - start)
+        self.border_subtitle = "cached" if self.slurm.is_stale("sinfo") else ""
+        self.loading = False  # Flag to indicate loading state
+
+    @staticmethod
+    def bar(partition: PartitionStatus, bar_width: int) -> str:
+        """Markup of the load bar of a partition."""
+        if partition.cpus_total:
+            weights = partition.cpus_alloc, partition.cpus_idle
+            weight_total = partition.cpus_total
+        else:
+            weights = partition.alloc, partition.idle
+            weight_total = partition.total
+        p_alloc_rs, p_idle_rs = (
+            int(weight / weight_total * bar_width) if weight_total else 0
+            for weight in weights
+        )
+        p_other_rs = bar_width - p_alloc_rs - p_idle_rs
+        return (
+            "[white]["
+            + "[red]|" * p_alloc_rs
+            + "[green]|" * p_idle_rs
+            + "[orange1]." * p_other_rs
+            + f"""{partition.load}%""".rjust(6)
+            + "[white]]"
+        )
+
+    @staticmethod
+    def table(show_gpus: bool, show_clusters: bool, rows: List[Tuple]) -> Table:
         partition_table = Table(
             show_header=True,
             header_style="bold",
@@ -51,9 +126,8 @@ class PartitionsUtilizationViewer(Widget):
             padding=(0, 1),
             expand=True,
         )
-
-        bar_width = 25
-
+        if show_clusters:
+            partition_table.add_column("Cluster", style="cyan", no_wrap=True)
         partition_table.add_column(
             "Partition", justify="left", style="cyan", no_wrap=True
         )
@@ -62,28 +136,9 @@ class PartitionsUtilizationViewer(Widget):
         partition_table.add_column("[green]Idle", justify="right", no_wrap=True)
         partition_table.add_column("[orange1]Other", justify="right", no_wrap=True)
         partition_table.add_column("Total", justify="right", no_wrap=True)
-
-        partitions = self.sinfo.data
-        for partition in partitions:
-            p_name, p_alloc, p_idle, p_other, p_ratio_usage = partition
-
-            p_total = p_alloc + p_idle + p_other
-            p_alloc_rs = int(p_alloc / p_total * bar_width)
-            p_idle_rs = int(p_idle / p_total * bar_width)
-            p_other_rs = bar_width - p_alloc_rs - p_idle_rs
-
-            p_bar = (
-                "[white]["
-                + "[red]|" * p_alloc_rs
-                + "[green]|" * p_idle_rs
-                + "[orange1]." * p_other_rs
-                + f"""{p_ratio_usage}%""".rjust(6)
-                + "[white]]"
-            )
-            partition_table.add_row(
-                p_name, p_bar, str(p_alloc), str(p_idle), str(p_other), str(p_total)
-            )
-
-        text = self.query_one(Label)
-        text.update(partition_table)
-        self.loading = False  # Flag to indicate loading state
+        if show_gpus:
+            partition_table.add_column("GPUs", justify="right", no_wrap=True)
+        partition_table.add_column("Last hour", no_wrap=True)
+        for row in rows:
+            partition_table.add_row(*row)
+        return partition_table
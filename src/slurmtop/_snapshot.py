@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import platform
+import time
+from typing import Optional, Sequence, Tuple
+
+from ._jobtable import JobTable
+from ._nodes import NodeStatus, PartitionStatus, SinfoSnapshot
+
+
+class SnapshotCache:
+    """Last partition status and job list, kept on disk between sessions.
+
+    A new session can then draw them at once, marked as stale, while the live
+    data is being fetched. Snapshots are stored per node and per job
+    selection, ``key`` being the squeue arguments of the selection, and are
+    ignored once older than ``ttl`` seconds.
+    """
+
+    def __init__(self, cache_dir: str, key: Sequence[str] = (), ttl: float = 86400.0):
+        self.cache_dir = cache_dir
+        self.digest = hashlib.sha1(json.dumps(list(key)).encode()).hexdigest()[:12]
+        self.ttl = ttl
+
+    @property
+    def path(self) -> str:
+        return os.path.join(
+            self.cache_dir, f"snapshot-{platform.node()}-{self.digest}.json"
+        )
+
+    def load(self) -> Optional[Tuple[SinfoSnapshot, JobTable]]:
+        """The saved sinfo snapshot and job table, None if missing or invalid."""
+        try:
+            with open(self.path, "r") as f:
+                cached = json.load(f)
+            if time.time() - cached["timestamp"] > self.ttl:
+                return None
+            sinfo = cached["sinfo"]
+            sinfo_snapshot = SinfoSnapshot(
+                tuple(PartitionStatus(*fields) for fields in sinfo["partitions"]),
+                tuple(
+                    NodeStatus(name, state, tuple(partitions), *counts)
+                    for name, state, partitions, *counts in sinfo["nodes"]
+                ),
+            )
+            return sinfo_snapshot, JobTable.from_dict(cached["squeue"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, sinfo_snapshot: SinfoSnapshot, table: JobTable) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "timestamp": time.time(),
+                        "sinfo": sinfo_snapshot._asdict(),
+                        "squeue": table.to_dict(),
+                    },
+                    f,
+                )
+            os.replace(tmp_path, self.path)  # Atomic, concurrent sessions are safe
+        except OSError as e:
+            print(f"Error caching snapshot: {e}")
@@ -1,21 +1,25 @@
-import json
-import re
-import subprocess
-from asyncio import sleep
-from datetime import datetime, timedelta
+import time
+from array import array
+from typing import List, Tuple
 
+from rich.console import Group
 from rich.table import Table
-from textual import work
-from textual.app import App, ComposeResult
-from textual.events import Click
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import VerticalScroll
 from textual.widget import Widget
-from textual.widgets import DataTable, Label
+from textual.widgets import Input, Label
 
-from ._data import SlurmData, SqueueData
+from ._data import SlurmData, SqueueSnapshot
+from ._detail_widget import JobDetailPane
+from ._jobfilter import JobFilter
+from ._jobtable import JobTable
+from ._jobview import JobTableView
+from ._metrics import RUNNING_NODES
 
 
 class SqueueViewer(Widget):
-    """Viewer Widget for SQUEUE, generate a datatable for all jobs running on slurm"""
+    """Viewer Widget for SQUEUE, a virtual-scrolling table of all jobs on slurm"""
 
     BORDER_TITLE = "SQUEUE"
     DEFAULT_CSS = """
@@ -24,110 +28,191 @@ class SqueueViewer(Widget):
         width: 100%;
         border: round #33ffbe;
     }
-    DataTable {
+    JobTableView {
         scrollbar-size: 1 1;
         scrollbar-background: black 0%;
     }
+    SqueueViewer #job-filter {
+        dock: bottom;
+        height: 1;
+        border: none;
+        padding: 0 1;
+        display: none;
+    }
     """
+    BINDINGS = [
+        Binding("slash", "filter", "Filter"),
+        Binding("escape", "back", "Back", show=False),
+    ]
+
+    max_sort_columns = 3  # Columns kept in a multi-column sort
 
     def __init__(self, slurm: SlurmData):
         super().__init__()
+        self.slurm = slurm
         self.squeue = slurm.squeue_data
-        self.current_sorts = {}  # Dictionary to keep track of sorting order
-        self.sorted_column = None  # Track the currently sorted column
-        self.sorted_order = (
-            None  # Track the current order (True for ascending, False for descending)
-        )
+        # Active sort, (column, reverse) pairs with the most significant first
+        self.sort_spec: List[Tuple[str, bool]] = []
         self.loading = True  # Flag to indicate loading state
+        self.shown_table = JobTable()  # Snapshot currently displayed
+        self.sorted_order: List[int] = []  # Rows of ``shown_table``, sorted
+        self._positions = None  # Rank of every row in ``sorted_order``
+        self.job_filter = JobFilter()
+        # (table, sorted order, filter) of the rows being displayed
+        self._filtered = None
 
     def compose(self) -> ComposeResult:
-        yield DataTable(cursor_type="row")
+        yield JobDetailPane(self.slurm)
+        yield JobTableView(self.squeue.keys)
+        yield Input(
+            placeholder="user:  partition:  state:  /regex  or name",
+            id="job-filter",
+        )
 
     def on_mount(self) -> None:
         """Start loading data when the widget is mounted."""
-        # self.set_interval(5.0, self.refresh_viewer)
-        self.refresh_viewer(refresh_data=True)  # Trigger the async data loading task
-
-    @work  # Make sure this runs asynchronously
-    async def refresh_viewer(self, refresh_data: bool = False) -> None:
-        """Simulate loading data asynchronously."""
-        data_table = self.query_one(DataTable)
-
-        if refresh_data:
-            self.squeue.refresh()
-        jobs = self.squeue.jobs  # Fetch jobs using SqueueData
-
-        data_table.clear(columns=True)  # Clear existing columns and data
-
-        # Columns to display
-        columns = self.squeue.keys
-
-        # Add columns with current sort order indicator if applicable
-        for column in columns:
-            data_table.add_column(f"{column}", key=column)
-
-        # Add rows
-        for job in jobs:
-            row = [self.format_value(job, col) for col in columns]
-            data_table.add_row(*row)
-
+        self.slurm.subscribe("squeue", self.refresh_viewer)
+
+    def on_unmount(self) -> None:
+        self.slurm.unsubscribe("squeue", self.refresh_viewer)
+        self.app.frames.cancel(self)
+
+    def refresh_viewer(self, snapshot: SqueueSnapshot) -> None:
+        """Show a snapshot in the next frame."""
+        self.app.frames.schedule(self, lambda: self.draw(snapshot))
+
+    def draw(self, snapshot: SqueueSnapshot) -> None:
+        """Show a snapshot, keeping the active sort.
+
+        Nothing is copied into the widget: the view reads the snapshot table
+        and only formats the rows that are visible. A snapshot without any
+        change keeps the displayed table, sorted and filtered as it is.
+        """
+        if snapshot.diff or self.loading:
+            self.shown_table = snapshot.table
+            with self.slurm.profiler.time("squeue", "render"):
+                self.apply_sort()
+        else:
+            self.set_subtitle()
         self.loading = False  # Data has been loaded, stop loading indicator
 
-    def format_value(self, job: dict, key: str) -> str:
-        """Format the value based on the key."""
-        return job.get(key, "N/A")
-
-    def sort_reverse(self, column: str) -> bool:
-        """Toggle and return the reverse sorting order for the specified column."""
-        self.current_sorts[column] = not self.current_sorts.get(column, False)
-        return self.current_sorts[column]
-
     def sort(self, column: str) -> None:
-        """Sort the DataTable by the specified column."""
-
-        self.sorted_column = column
-        self.sorted_order = not self.current_sorts.get(column, False)
+        """Sort by ``column``, the previous sort columns breaking ties.
 
-        if column == "time_elapse":
-            self.action_sort_by_time(column)
-        elif column == "node_number":
-            self.action_sort_by_number(column)
+        Selecting the primary column again toggles its order.
+        """
+        if self.sort_spec and self.sort_spec[0][0] == column:
+            self.sort_spec[0] = (column, not self.sort_spec[0][1])
         else:
-            self.action_sort_by_string(column)
-
-    def action_sort_by_time(self, column: str) -> None:
-        """Sort DataTable by time used in D-HH:MM:SS, HH:MM:SS"""
-        table = self.query_one(DataTable)
-        table.sort(
-            column,
-            key=lambda column: datetime_to_seconds(
-                column
-            ),  # Convert time to total seconds for sorting
-            reverse=self.sort_reverse(column),
-        )
-
-    def action_sort_by_string(self, column: str) -> None:
-        """Sort DataTable by specific key."""
-        table = self.query_one(DataTable)
-        table.sort(
-            column,
-            key=lambda column: column,
-            reverse=self.sort_reverse(column),
-        )
-
-    def action_sort_by_number(self, column: str) -> None:
-        """Sort DataTable by specific key."""
-        table = self.query_one(DataTable)
-        table.sort(
-            column,
-            key=lambda column: int(column),
-            reverse=self.sort_reverse(column),
-        )
-
-    def on_data_table_header_selected(self, event: Click) -> None:
-        """Sort `DataTable` items by the clicked column header."""
-        column_name = event.label.plain.split()[0]
-        self.sort(column_name)  # Extract the column name without the sort indicator
+            others = [
+                (key, reverse) for key, reverse in self.sort_spec if key != column
+            ]
+            self.sort_spec = [(column, False)] + others[: self.max_sort_columns - 1]
+        self.apply_sort()
+
+    def apply_sort(self) -> None:
+        """Re-apply the active sort, e.g. after a refresh."""
+        view = self.query_one(JobTableView)
+        view.sort_indicators = dict(self.sort_spec[:1])
+        self.sorted_order = self.shown_table.sorted_rows(self.sort_spec)
+        self._positions = None
+        self.apply_filter()
+
+    def apply_filter(self) -> None:
+        """Show the sorted rows accepted by the active filter.
+
+        A filter narrowing the previous one only rechecks the rows it matched,
+        not the whole table, a new table, a new sort or a wider filter starts
+        over from the indexes.
+        """
+        view = self.query_one(JobTableView)
+        table, job_filter = self.shown_table, self.job_filter
+        if not job_filter:
+            order = self.sorted_order
+        elif (
+            self._filtered is not None
+            and self._filtered[0] is table
+            and self._filtered[1] is self.sorted_order
+            and job_filter.narrows(self._filtered[2])
+        ):
+            order = job_filter.select(table, view.order)
+        else:
+            if self._positions is None:
+                self._positions = array("q", bytes(8 * len(table)))
+                for position, row in enumerate(self.sorted_order):
+                    self._positions[row] = position
+            order = job_filter.select(table, self.sorted_order, self._positions)
+        self._filtered = (table, self.sorted_order, job_filter)
+        view.show(table, order)
+        self.set_subtitle()
+
+    def set_subtitle(self) -> None:
+        notes = []
+        if self.job_filter:
+            order = self.query_one(JobTableView).order
+            notes.append(f"{len(order)}/{len(self.shown_table)} jobs")
+        if self.slurm.is_stale("squeue"):
+            notes.append("cached")
+        self.border_subtitle = ", ".join(notes)
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Narrow the job list as the filter is typed."""
+        self.job_filter = JobFilter(event.value)
+        self.apply_filter()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        self.query_one(JobTableView).focus()
+
+    def action_filter(self) -> None:
+        job_filter = self.query_one("#job-filter", Input)
+        job_filter.display = True
+        job_filter.focus()
+
+    def action_back(self) -> None:
+        """Close the job detail pane, or else clear the filter."""
+        pane = self.query_one(JobDetailPane)
+        if pane.display:
+            pane.display = False
+        else:
+            self.action_clear_filter()
+
+    def action_clear_filter(self) -> None:
+        job_filter = self.query_one("#job-filter", Input)
+        job_filter.value = ""  # Posts Input.Changed, which shows every job
+        job_filter.display = False
+        self.query_one(JobTableView).focus()
+
+    def _jobs(self, job_keys: List[int]) -> List[Tuple[int, str]]:
+        """(job id, cluster) of displayed jobs."""
+        table = self.query_one(JobTableView).table
+        rows = table.rows
+        return [(table.job_id[rows[key]], table.cluster[rows[key]]) for key in job_keys]
+
+    def on_job_table_view_row_selected(self, event: JobTableView.RowSelected) -> None:
+        """Open the detail pane on the selected job."""
+        pane = self.query_one(JobDetailPane)
+        pane.display = True
+        view = self.query_one(JobTableView)
+        job, *neighbours = self._jobs([event.job_key] + view.jobs_around(pane.prefetch))
+        pane.show_job(job, neighbours, wait=False)
+
+    def on_job_table_view_row_highlighted(
+        self, event: JobTableView.RowHighlighted
+    ) -> None:
+        """Follow the cursor while the detail pane is open."""
+        pane = self.query_one(JobDetailPane)
+        if not pane.display:
+            return
+        view = self.query_one(JobTableView)
+        job, *neighbours = self._jobs([event.job_key] + view.jobs_around(pane.prefetch))
+        if job != pane.job:
+            pane.show_job(job, neighbours)
+
+    def on_job_table_view_header_selected(
+        self, event: JobTableView.HeaderSelected
+    ) -> None:
+        """Sort jobs by the clicked column header."""
+        self.sort(event.key)
 
 
 class SqueueMetricsViewer(Widget):
@@ -142,24 +227,62 @@ class SqueueMetricsViewer(Widget):
     }
     """
 
+    max_users = 5  # Users with the most running nodes shown
+    max_reasons = 5  # Most frequent pending reasons shown
+
     def __init__(self, slurm: SlurmData = None):
         super().__init__()
         self.slurm = slurm
         self.loading = True  # Flag to indicate loading state
+        self._drawn = None  # Rows of the tables displayed
 
     def compose(self) -> ComposeResult:
-        yield Label()
+        yield VerticalScroll(Label())
 
     def on_mount(self) -> None:
         """Start loading data when the widget is mounted."""
-        self.load_data()  # Trigger the async data loading task
-
-    @work  # Make sure this runs asynchronously
-    async def load_data(self) -> None:
-        """Simulate loading data asynchronously."""
-        await sleep(1)  # Simulate data fetching or processing delay
-        jobs = self.slurm.squeue_data.jobs
+        self.slurm.subscribe("squeue", self.load_data)
+
+    def on_unmount(self) -> None:
+        self.slurm.unsubscribe("squeue", self.load_data)
+        self.app.frames.cancel(self)
+
+    def load_data(self, snapshot: SqueueSnapshot) -> None:
+        """Draw the queue metrics in the next frame."""
+        self.app.frames.schedule(self, lambda: self.draw(snapshot))
+
+    def draw(self, snapshot: SqueueSnapshot) -> None:
+        """Draw the queue metrics, aggregated incrementally by the data layer.
+
+        The tables are only rebuilt when one of their rows changed.
+        """
+        start = time.perf_counter()
+        metrics = snapshot.metrics
+        partitions = tuple(
+            (p_name, tuple(counts))
+            for p_name, counts in sorted(metrics.partitions.items())
+        )
+        top_users = sorted(
+            metrics.users.items(), key=lambda item: item[1][RUNNING_NODES], reverse=True
+        )
+        users = tuple(
+            (u_name, tuple(counts)) for u_name, counts in top_users[: self.max_users]
+        )
+        top_reasons = sorted(
+            metrics.pending_reasons.items(), key=lambda item: item[1], reverse=True
+        )
+        reasons = tuple(top_reasons[: self.max_reasons])
+
+        drawn = (partitions, users, reasons)
+        if drawn != self._drawn:
+            self._drawn = drawn
+            self.query_one(Label).update(self.tables(partitions, users, reasons))
+        self.slurm.profiler.record("squeue", "render", time.perf_counter() - start)
+        self.border_subtitle = "cached" if self.slurm.is_stale("squeue") else ""
+        self.loading = False  # Data has been loaded, stop loading indicator
 
+    @staticmethod
+    def tables(partitions, users, reasons) -> Group:
         metrics_table = Table(
             show_header=True,
             header_style="bold",
@@ -168,39 +291,45 @@ class SqueueMetricsViewer(Widget):
             expand=True,
         )
 
+        bar_width = 20
+
         metrics_table.add_column(
             "Partition", justify="left", style="cyan", no_wrap=True
         )
         metrics_table.add_column("Jobs-Ratio")
         metrics_table.add_column("[notbold][red]Running", justify="right", no_wrap=True)
         metrics_table.add_column("[orange1]Pending", justify="right", no_wrap=True)
+        metrics_table.add_column("Nodes", justify="right", no_wrap=True)
+
+        for p_name, (p_running, p_pending, p_nodes) in partitions:
+            p_running_rs = round(p_running / (p_running + p_pending) * bar_width)
+            ratio_running_pending = "[red]█" * p_running_rs + "[orange1]█" * (
+                bar_width - p_running_rs
+            )
+            metrics_table.add_row(
+                p_name,
+                ratio_running_pending,
+                str(p_running),
+                str(p_pending),
+                str(p_nodes),
+            )
+
+        users_table = Table(
+            show_header=True, header_style="bold", box=None, padding=(0, 1), expand=True
+        )
+        users_table.add_column("User", style="cyan", no_wrap=True)
+        users_table.add_column("[notbold][red]Running", justify="right", no_wrap=True)
+        users_table.add_column("[orange1]Pending", justify="right", no_wrap=True)
+        users_table.add_column("Nodes", justify="right", no_wrap=True)
+        for u_name, (u_running, u_pending, u_nodes) in users:
+            users_table.add_row(u_name, str(u_running), str(u_pending), str(u_nodes))
+
+        reasons_table = Table(
+            show_header=True, header_style="bold", box=None, padding=(0, 1), expand=True
+        )
+        reasons_table.add_column("Pending reason", style="orange1", no_wrap=True)
+        reasons_table.add_column("Jobs", justify="right", no_wrap=True)
+        for reason, count in reasons:
+            reasons_table.add_row(reason, str(count))
 
-        ratio_running_pending = "[red]█" * 10 + "[orange1]█" * 10
-        metrics_table.add_row("cpu_p1", ratio_running_pending, "2500", "3000")
-
-        label = self.query_one(Label)
-        label.update(metrics_table)
-        self.loading = False  # Data has been loaded, stop loading indicator
-
-
-def datetime_to_seconds(time_str: str) -> int:
-    if time_str == "":
-        return 0
-
-    # Regex pattern to capture "D days, HH:MM:SS", "D day, HH:MM:SS", or "HH:MM:SS"
-    pattern = re.compile(
-        r"(?:(\d+)\s+days?\s*,\s+|(?:(\d+)\s+day\s*,\s+))?(\d+):(\d+):(\d+)"  # "D days, HH:MM:SS" or "D day, HH:MM:SS" or "HH:MM:SS"
-    )
-    match = pattern.match(time_str)
-
-    if not match:
-        raise ValueError(f"Invalid time format: {time_str}")
-
-    days = int(match.group(1) or 0)
-    hours = int(match.group(3) or 0)
-    minutes = int(match.group(4))
-    seconds = int(match.group(5) or 0)
-
-    # Convert all to total seconds
-    total_seconds = days * 86400 + hours * 3600 + minutes * 60 + seconds
-    return total_seconds
+        return Group(metrics_table, "", users_table, "", reasons_table)
@@ -0,0 +1,72 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List
+
+from ._runner import SlurmCommandError
+
+
+class WorkerPool:
+    """Processes running the CPU-bound parsing of large command outputs.
+
+    Parsed in the UI process, a large squeue output holds the event loop, and
+    the GIL, for as long as it takes, and the interface freezes meanwhile.
+    Outputs are sent to worker processes instead, as shards of whole lines
+    parsed on as many cores, and come back as job tables: a few native
+    arrays and string lists, cheap to pickle, rather than raw job dicts.
+    Workers are spawned at first use, and a pool whose worker died is
+    replaced at the next one.
+
+    A pool must be created before Textual replaces the standard streams: the
+    resource tracker of multiprocessing, started along with its first pool,
+    is handed the file descriptor of stderr.
+    """
+
+    min_shard_size = 1 << 20  # Characters of output per shard, at least
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = self._new_executor()
+
+    def shards(self, output: str) -> List[str]:
+        """``output`` split on line ends, in one shard per worker at most."""
+        count = max(1, min(self.workers, len(output) // self.min_shard_size))
+        bounds = [0]
+        for index in range(1, count):
+            end = output.find("\n", len(output) * index // count)
+            if end < 0:
+                break
+            bounds.append(end + 1)
+        bounds.append(len(output))
+        return [
+            output[start:end] for start, end in zip(bounds, bounds[1:]) if start < end
+        ]
+
+    async def run(self, function: Callable, *args) -> Any:
+        """Result of ``function(*args)``, computed by a worker process.
+
+        ``function`` must be a module-level function, its arguments and result
+        picklable. Its exceptions are raised as is.
+        """
+        if self._executor is None:
+            self._executor = self._new_executor()
+        executor = self._executor
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool as e:
+            if self._executor is executor:
+                self._executor = None
+            raise SlurmCommandError(f"Worker process died: {e}") from e
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the UI process runs threads
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
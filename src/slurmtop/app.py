@@ -1,26 +1,19 @@
-import argparse
-from sys import version_info
+import time
 
+from textual import events
 from textual.app import App, ComposeResult
 from textual.binding import Binding
-from textual.containers import Horizontal, Vertical
-from textual.widgets import Footer, Label, Markdown, TabbedContent, TabPane
+from textual.containers import Horizontal
+from textual.widgets import Footer
 
-from .__about__ import __version__
-from ._data import SinfoData, SlurmData, SqueueData
+from ._data import SlurmData
 from ._info_widget import InfoLine
+from ._nodes_widget import NodeHeatmap
+from ._profile_widget import ProfileOverlay
+from ._render import FrameScheduler
 from ._sinfo_widget import PartitionsUtilizationViewer
 from ._squeue_widget import SqueueMetricsViewer, SqueueViewer
-
-
-def _get_version_text():
-    python_version = f"{version_info.major}.{version_info.minor}.{version_info.micro}"
-    return "\n".join(
-        [
-            f"slurmtop {__version__} [Python {python_version}]",
-            "Copyright (c) 2024 Léo Hunout (IDRIS/CNRS)",
-        ]
-    )
+from .cli import run  # noqa: F401, the entry point used to live here
 
 
 class SlurmtopApp(App):
@@ -37,36 +30,69 @@ class SlurmtopApp(App):
 
     BINDINGS = [
         Binding(key="q", action="quit", description="Quit"),
+        Binding(key="p", action="toggle_profile", description="Profile"),
+        Binding(key="n", action="toggle_nodes", description="Nodes"),
     ]
 
-    def __init__(self):
+    idle_after = 300.0  # Seconds without any input before polling slows down
+
+    def __init__(self, slurm: SlurmData = None, max_fps: float = 10.0):
         super().__init__()
-        self.slurm = SlurmData()
+        self.slurm = slurm or SlurmData()
+        # Redraws of every widget, coalesced into at most max_fps frames
+        self.frames = FrameScheduler(self, max_fps)
+        self._last_input = time.monotonic()
+        self._focused = True  # Whether the terminal has the focus
+        self._idle = False
 
     def compose(self) -> ComposeResult:
-        yield InfoLine()
+        yield InfoLine(self.slurm)
 
         yield Horizontal(
             PartitionsUtilizationViewer(self.slurm),
-            # SqueueMetricsViewer(self.slurm),
+            NodeHeatmap(self.slurm),
+            SqueueMetricsViewer(self.slurm),
         )
         yield SqueueViewer(self.slurm)
+        yield ProfileOverlay(self.slurm)
         yield Footer()
 
+    def on_mount(self) -> None:
+        # One shared scheduler fetches each source and fans it out to widgets
+        self.run_worker(self.slurm.run(), name="scheduler")
+        self.frames.add_ticker(self.check_activity)
+
+    async def on_event(self, event: events.Event) -> None:
+        if isinstance(event, (events.Key, events.MouseEvent)):
+            self._last_input = time.monotonic()
+            if self._idle:
+                self.check_activity()
+        await super().on_event(event)
+
+    def on_app_focus(self) -> None:
+        self._focused = True
+        self.check_activity()
+
+    def on_app_blur(self) -> None:
+        self._focused = False
+        self.check_activity()
+
+    def check_activity(self) -> None:
+        """Slow polling down while the terminal is unfocused or nobody types."""
+        idle = (
+            not self._focused or time.monotonic() - self._last_input > self.idle_after
+        )
+        if idle != self._idle:
+            self._idle = idle
+            self.slurm.set_idle(idle)
+
+    def action_toggle_nodes(self) -> None:
+        """Swap the partition table and the node heatmap."""
+        heatmap = self.query_one(NodeHeatmap)
+        heatmap.display = not heatmap.display
+        self.query_one(PartitionsUtilizationViewer).display = not heatmap.display
+        if heatmap.display:
+            heatmap.focus()
 
-def run(argv=None):
-    parser = argparse.ArgumentParser(
-        description="Command-line Slurm monitor.",
-        formatter_class=argparse.RawTextHelpFormatter,
-    )
-    parser.add_argument(
-        "-v",
-        "--version",
-        action="version",
-        version=_get_version_text(),
-        help="display version information",
-    )
-
-    args = parser.parse_args(argv)
-    app = SlurmtopApp()
-    app.run()
+    def action_toggle_profile(self) -> None:
+        self.query_one(ProfileOverlay).toggle()
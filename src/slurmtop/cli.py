@@ -0,0 +1,335 @@
+import argparse
+import getpass
+import os
+import sys
+from sys import version_info
+from typing import Dict, List, Optional
+
+from .__about__ import __version__
+
+
+def _get_version_text():
+    python_version = f"{version_info.major}.{version_info.minor}.{version_info.micro}"
+    return "\n".join(
+        [
+            f"slurmtop {__version__} [Python {python_version}]",
+            "Copyright (c) 2024 Léo Hunout (IDRIS/CNRS)",
+        ]
+    )
+
+
+def _split_list(value: str) -> List[str]:
+    """Split a comma separated CLI value, as squeue does."""
+    return [item for item in (value or "").split(",") if item]
+
+
+def _read_clusters(path: str) -> Dict[str, Optional[float]]:
+    """Clusters of a file, one per line, optionally followed by the seconds
+    allowed to its commands. Blank lines and ``#`` comments are ignored."""
+    clusters = {}
+    with open(path, "r") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(f"invalid line: {line.strip()}")
+            clusters[fields[0]] = float(fields[1]) if len(fields) == 2 else None
+    return clusters
+
+
+def _run_headless(args, slurm) -> None:
+    """Stream the snapshots of ``slurm`` as asked by the export options."""
+    import asyncio
+    import contextlib
+
+    from ._export import (
+        CsvExporter,
+        JsonLinesExporter,
+        PrometheusExporter,
+        run_headless,
+    )
+
+    stream = sys.stdout
+    if args.output is not None and args.headless != "prometheus":
+        stream = open(args.output, "a")
+    if args.headless == "prometheus":
+        exporter = PrometheusExporter(stream, path=args.output, listen=args.listen)
+    elif args.headless == "csv":
+        exporter = CsvExporter(stream, diff=args.diff)
+    else:
+        exporter = JsonLinesExporter(stream, diff=args.diff)
+    try:
+        # Keep stdout for the data, messages go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(run_headless(slurm, exporter, once=args.once))
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The reader went away, e.g. `| head`: stop without flushing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Command-line Slurm monitor.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=_get_version_text(),
+        help="display version information",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not read or write the on-disk cache",
+    )
+
+    query_group = parser.add_argument_group(
+        "job selection", "passed down to squeue, comma separated lists are accepted"
+    )
+    query_group.add_argument("-u", "--user", help="only show jobs of these users")
+    query_group.add_argument(
+        "--me", action="store_true", help="only show jobs of the current user"
+    )
+    query_group.add_argument("-p", "--partition", help="only show these partitions")
+    query_group.add_argument(
+        "-t", "--state", help="only show jobs in these states, e.g. R,PD"
+    )
+    query_group.add_argument("-A", "--account", help="only show these accounts")
+    query_group.add_argument(
+        "-n", "--name", help="only show jobs whose name matches this pattern"
+    )
+
+    source_group = parser.add_argument_group(
+        "data source", "where the Slurm data comes from, slurm commands by default"
+    )
+    source = source_group.add_mutually_exclusive_group()
+    source.add_argument(
+        "--record", metavar="DIR", help="save the output of every Slurm command"
+    )
+    source.add_argument(
+        "--replay", metavar="DIR", help="replay the outputs saved with --record"
+    )
+    source.add_argument(
+        "--connect",
+        metavar="SOCKET",
+        nargs="?",
+        const="",  # The default socket of the node
+        help="get the data from a slurmtop --serve of this node",
+    )
+    source.add_argument(
+        "--synthetic",
+        metavar="JOBS",
+        type=int,
+        help="show a generated cluster with this many jobs",
+    )
+    clusters = source_group.add_mutually_exclusive_group()
+    clusters.add_argument(
+        "-M",
+        "--clusters",
+        help="monitor these clusters side by side, fetched concurrently",
+    )
+    clusters.add_argument(
+        "--clusters-file",
+        metavar="FILE",
+        help="clusters to monitor, one per line, optionally followed by\n"
+        "the seconds allowed to their Slurm commands",
+    )
+
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        nargs="?",
+        const="",  # The default socket of the node
+        help="poll Slurm once for every slurmtop --connect of this node",
+    )
+
+    parser.add_argument(
+        "--interval",
+        metavar="SECONDS",
+        type=float,
+        help="refresh the partitions and the job list at this period, in the\n"
+        "interface as in headless mode (default 5 and 30)",
+    )
+    parser.add_argument(
+        "--squeue-interval",
+        metavar="SECONDS",
+        type=float,
+        help="refresh the job list at this period, overriding --interval\n"
+        "(default 30), elapsed and remaining times keep ticking in between",
+    )
+    parser.add_argument(
+        "--no-probe",
+        action="store_true",
+        help="fetch at every refresh, even when the sdiag counters of the\n"
+        "controller did not change",
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        type=int,
+        nargs="?",
+        const=os.cpu_count() or 1,
+        default=0,
+        help="parse the job lists in N worker processes (one per core if N\n"
+        "is omitted), so that large queues do not freeze the interface",
+    )
+    parser.add_argument(
+        "--max-fps",
+        metavar="FPS",
+        type=float,
+        default=10.0,
+        help="redraw the interface at most this many times per second (default 10)",
+    )
+
+    export_group = parser.add_argument_group(
+        "headless export", "stream the data for scripts and monitoring, without the TUI"
+    )
+    export_group.add_argument(
+        "--headless",
+        choices=("jsonl", "csv", "prometheus"),
+        help="jsonl: partitions, nodes and jobs; csv: jobs; prometheus: metrics",
+    )
+    export_group.add_argument(
+        "--output",
+        metavar="FILE",
+        help="append to FILE instead of stdout, with prometheus the\n"
+        "textfile collector file, rewritten at every refresh",
+    )
+    export_group.add_argument(
+        "--listen",
+        metavar="[HOST:]PORT",
+        help="with prometheus, serve the metrics over HTTP (default host 127.0.0.1)",
+    )
+    export_group.add_argument(
+        "--diff",
+        action="store_true",
+        help="only stream the jobs and nodes added, changed or removed",
+    )
+    export_group.add_argument(
+        "--once", action="store_true", help="export each source once and exit"
+    )
+
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="append the stage timings of every refresh to FILE, as JSON lines",
+    )
+
+    args = parser.parse_args(argv)
+    if args.max_fps <= 0:
+        parser.error("--max-fps must be positive")
+    if args.workers < 0:
+        parser.error("--workers must not be negative")
+    cluster_timeouts = dict.fromkeys(_split_list(args.clusters))
+    if args.clusters_file is not None:
+        try:
+            cluster_timeouts = _read_clusters(args.clusters_file)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read --clusters-file: {e}")
+    if args.listen is not None:
+        if args.headless != "prometheus":
+            parser.error("--listen requires --headless prometheus")
+        host, _, port = args.listen.rpartition(":")
+        if not port.isdigit():
+            parser.error(f"invalid --listen address: {args.listen}")
+        args.listen = (host or "127.0.0.1", int(port))
+
+    # Imported once the arguments are parsed, so that --help and --version
+    # do not pay for asyncio, the data layer, nor for Textual
+    import asyncio
+
+    from ._data import SlurmData, SqueueQuery
+    from ._facts import default_cache_dir
+    from ._profile import Profiler
+    from ._replay import RecordingRunner, ReplayRunner, SyntheticRunner
+    from ._runner import CommandRunner
+    from ._server import CacheServer, SocketRunner, default_socket_path
+
+    users = _split_list(args.user)
+    if args.me:
+        users.append(getpass.getuser())
+    query = SqueueQuery(
+        users=users,
+        partitions=_split_list(args.partition),
+        states=_split_list(args.state),
+        accounts=_split_list(args.account),
+        name=args.name,
+    )
+    profiler = Profiler(args.profile)
+    # Every cluster gets its own sinfo and squeue commands at once
+    concurrency = max(4, 2 * len(cluster_timeouts))
+    if args.record:
+        runner = RecordingRunner(
+            args.record, max_concurrency=concurrency, profiler=profiler
+        )
+    elif args.replay:
+        runner = ReplayRunner(
+            args.replay, max_concurrency=concurrency, profiler=profiler
+        )
+    elif args.connect is not None:
+        runner = SocketRunner(
+            args.connect or default_socket_path(),
+            fallback=CommandRunner(max_concurrency=concurrency, profiler=profiler),
+            profiler=profiler,
+        )
+    elif args.synthetic is not None:
+        runner = SyntheticRunner(
+            partitions=8,
+            jobs=args.synthetic,
+            churn=0.01,
+            max_concurrency=concurrency,
+            profiler=profiler,
+        )
+    else:
+        runner = CommandRunner(max_concurrency=concurrency, profiler=profiler)
+    if args.serve is not None:
+        server = CacheServer(args.serve or default_socket_path(), runner)
+        print(f"Serving Slurm data on {server.path}")
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        return
+    intervals = {}
+    if args.interval is not None:
+        intervals = {"sinfo": args.interval, "squeue": args.interval}
+    if args.squeue_interval is not None:
+        intervals["squeue"] = args.squeue_interval
+    if args.headless is not None:
+        # Nothing is drawn, cached snapshots are not the cluster state, and
+        # every refresh is exported, without any change probe
+        slurm = SlurmData(
+            runner=runner,
+            intervals=intervals,
+            query=query,
+            clusters=cluster_timeouts,
+            workers=args.workers,
+        )
+        _run_headless(args, slurm)
+        return
+    # Facts of a replayed or generated cluster must not be cached
+    offline = args.replay or args.synthetic is not None
+    cache_dir = None if args.no_cache or offline else default_cache_dir()
+    slurm = SlurmData(
+        runner=runner,
+        intervals=intervals,
+        cache_dir=cache_dir,
+        query=query,
+        clusters=cluster_timeouts,
+        probe=not args.no_probe,
+        workers=args.workers,
+    )
+
+    from .app import SlurmtopApp
+
+    app = SlurmtopApp(slurm, max_fps=args.max_fps)
+    app.run()